@@ -14,3 +14,6 @@ import layer
 import capture
 import packet
 
+import pktlist
+import pcapfile
+import sidecar
@@ -9,7 +9,8 @@ All rights reserved.
 
 class Assoc():
   def __init__(self):
-    self._vals = []
+    self._vals = [] # List of [key, value], key is None for values only reachable by index
+    self._keys = {} # String key to index in self._vals of its first occurrence
 
   def __repr__(self):
     rv = ''
@@ -31,24 +32,37 @@ class Assoc():
       else:
         raise IndexError, "index out of range"        
     elif(isinstance(key, str)):
-      ii = -1
-      for k,v in self._vals:
-        ii += 1
-        if(key == k):
-          return ii
-      raise IndexError, "nonexistent string index"
+      try:
+        return self._keys[key]
+      except KeyError:
+        raise IndexError, "nonexistent string index"
     else:
       raise TypeError, "unknown index type"
 
+  # Rebuilds self._keys after self._vals has been reordered
+  # SHOULD never be called outside of class
+  def _reindex(self):
+    self._keys = {}
+    for ii in xrange(len(self._vals) - 1, -1, -1):
+      if(self._vals[ii][0] is not None):
+        self._keys[self._vals[ii][0]] = ii
+
+  # Appends a [key, value] pair
+  # SHOULD never be called outside of class
+  def _append(self, key, val):
+    if(key is not None and not key in self._keys):
+      self._keys[key] = len(self._vals)
+    self._vals.append(list(((key), (val))))
+
   def __setitem__(self, key, val):
     if(isinstance(key, int)):
       try:
         ii = self.__getIndex__(key)
         self._vals[ii] = list(((self._vals[ii][0]), (val)))
       except IndexError:
-        self._vals.append(list(((None), (val))))
+        self._append(None, val)
     elif(isinstance(key, str)):
-      self._vals.append(((key), (val)))
+      self._append(key, val)
     else:
       raise TypeError, "unknown index type"
 
@@ -59,7 +73,8 @@ class Assoc():
     return AssocIter(self._vals, False)
 
   def __delitem__(self, key):
-    del self._vals[self.getIndex(key)]
+    del self._vals[self.__getIndex__(key)]
+    self._reindex()
 
   def __len__(self):
     return len(self._vals)
@@ -101,28 +116,33 @@ class Assoc():
 
   def reverse(self):
     self._vals.reverse()
+    self._reindex()
 
   def append(self, x):
-    self._vals.append(((None), (x)))
+    self._append(None, x)
 
   def pop(self):
-    return self._vals.pop()[1]
+    k, v = self._vals.pop()
+    if(k is not None and self._keys.get(k) == len(self._vals)):
+      del self._keys[k]
+    return v
 
   def extend(self, L):
     if(len(L) < 1):
       return
 
     if(isinstance(L, Assoc)):
-      for k,v in L:
-        self._vals.append(list(((k), (v))))
+      for k,v in L._vals:
+        self._append(k, v)
     elif(isinstance(L, list)):
       for v in L:
-        self._vals.append(list(((None), (v))))
+        self._append(None, v)
     else:
       raise TypeError, "unknown type"
 
   def insert(self, key, val):
-    self._vals.insert(self.getIndex(key), list(((None), (val))))
+    self._vals.insert(self.__getIndex__(key), list(((None), (val))))
+    self._reindex()
 
   # Can return either a string or integer
   def index(self, val):
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+'''Expands compiled generator templates in bulk with NumPy, if it is installed'''
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+# hexcap specific imports
+import cfg
+
+# Returns True if we can expand templates in bulk
+def available():
+  return numpy is not None
+
+# Expands a template.Template into 2-D uint8 arrays with a row per generated packet
+# Every patch and checksum is computed for a whole block of rows at once
+# Checksums are summed straight from the first packet, RFC 1624 eqn. 3 with every changed patch added in
+class Expander:
+  def __init__(self, tpl):
+    self.numPkts = tpl.numPkts
+    self.base = numpy.frombuffer(tpl.base, numpy.uint8)
+    self.rows = max(1, cfg.writeBufSize // len(tpl.base)) # Rows per block
+
+    # [offset, end, count, value bytes as count x width array, [[Checksum, sums array]]] for every patch
+    self.patches = []
+    self.sums = [] # Checksums covering any patch
+    for p in tpl.patches:
+      vals = numpy.frombuffer(''.join(p.vals), numpy.uint8).reshape(p.count, p.end - p.off)
+      sums = []
+      for cs, s in p.sums:
+        sums.append([cs, numpy.array(s, numpy.int64)])
+        if(not cs in self.sums):
+          self.sums.append(cs)
+      self.patches.append([p.off, p.end, p.count, vals, sums])
+
+  # Returns generated packets first through last - 1 as a 2-D uint8 array
+  def frames(self, first, last):
+    ii = numpy.arange(first, last, dtype=numpy.int64)
+    rv = numpy.tile(self.base, (last - first, 1))
+
+    accs = {} # Running ones complement sum of every checksum
+    for cs in self.sums:
+      hc = (int(self.base[cs.off]) << 8) | int(self.base[cs.off + 1])
+      accs[cs] = numpy.empty(last - first, numpy.int64)
+      accs[cs].fill(~hc & 0xffff)
+
+    for off, end, count, vals, sums in self.patches:
+      k = ii % count
+      rv[:, off:end] = vals[k]
+      for cs, s in sums:
+        accs[cs] += (~int(s[0]) & 0xffff) + s[k]
+
+    for cs, acc in accs.iteritems():
+      while((acc >> 16).any()):
+        acc = (acc & 0xffff) + (acc >> 16)
+      hc = ~acc & 0xffff
+      if(cs.zeroIsNone):
+        hc[hc == 0] = 0xffff
+      rv[:, cs.off] = hc >> 8
+      rv[:, cs.off + 1] = hc & 0xff
+    return rv
+
+  # Yields all generated packets as 2-D uint8 arrays of at most self.rows rows
+  def blocks(self):
+    for first in xrange(0, self.numPkts, self.rows):
+      yield self.frames(first, min(first + self.rows, self.numPkts))
+
+# Returns passed 2-D array of packets as a string of pcap records
+# Takes the record header shared by every packet
+def records(frames, hdr):
+  hdrs = numpy.tile(numpy.frombuffer(hdr, numpy.uint8), (len(frames), 1))
+  return numpy.hstack((hdrs, frames)).tostring()
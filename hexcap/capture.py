@@ -9,15 +9,22 @@ import sys
 sys.path.insert(0, sys.path[0] + '/../dpkt/')
 import dpkt
 import os
+import shutil
 import dnet
 import pcapy as pcap
 import time
-import copy
+import weakref
+from collections import OrderedDict
 
 # hexcap specific imports
 import cfg
 import packet
 import layer
+import pktlist
+import pcapfile
+import template
+import bulk
+import sidecar
 
 # A good default packet to start with
 defaultPacket = '\x00\x00\x00\x00\x00\x02\x00\x00\x00\x00\x00\x01\x86\xdd\x00\x00\x00\x00\x00(\x06\x40\xfe\x80\x00\x00\x00\x00\x00\x00\x00\x00\x00\xff\xfe\x00\x00\x01\xfe\x80\x00\x00\x00\x00\x00\x00\x00\x00\x00\xff\xfe\x00\x00\x02\xcd\xd3\x00\x16\xffP\xd7\x13\x00\x00\x00\x00\xa0\x02\xff\xffg\xd3\x00\x00\x02\x04\x05\xa0\x01\x03\x03\x00\x01\x01\x08\n}\x18:a\x00\x00\x00\x00'
@@ -27,9 +34,15 @@ class Capture:
   def __init__(self, f=None, name=''):
     self.minSize = self.maxSize = False # These remain False until set
     self.clipboard = [] # Our buffer for yanking and pasting
-    self.packets = [] # Our list of packets
+    self.packets = pktlist.PacketList(self.decode) # Our list of packets
     self.fName = name
+    self.pcap = None # PcapFile we were read from
+    self.lazy = False # Are we decoding packets on demand
+    self.index = None # Sidecar index of our pcap file, only used when lazy
+    self.layerReg = OrderedDict() # Layer ID to [layer class, reference count] in order of first registration
+    self.layerGen = 0 # Incremented whenever a layer ID enters or leaves layerReg
     self.dataLink = pcap.DLT_EN10MB # Our default datalink
+    self.templates = weakref.WeakKeyDictionary() # Generator packet to [key, compiled Template or None]
 
     # Set our default ethernet device
     # TODO: Need more OS's here
@@ -49,17 +62,119 @@ class Capture:
     if(f):
       self.read(f) # Read in and initialize capture
     else:
-      self.packets.append(packet.Packet(self.dataLink, time.time(), defaultPacket, 1))
+      self.packets.append(self.track(packet.Packet(self.dataLink, time.time(), defaultPacket)))
       
   # Reads a filehandle to a pcap file
+  # Large captures only have their records indexed here and are decoded on demand
   def read(self, f):
-    pid = 1
-    cap = dpkt.pcap.Reader(f)
-    self.dataLink = cap.datalink() # http://www.tcpdump.org/linktypes.html
-    for ts, pkt in cap:
-      p = packet.Packet(self.dataLink, ts, pkt, pid)
-      self.packets.append(p)
-      pid += 1
+    self.pcap = pcapfile.PcapFile(f, False)
+    self.dataLink = self.pcap.datalink
+
+    if(self.pcap.size >= cfg.lazySize):
+      self.lazy = True
+      self.index = sidecar.load(self.fName, self.pcap)
+      if(self.index):
+        self.index.restore(self.pcap)
+      else:
+        self.buildIndex()
+
+      # Every record of a layer stack is counted at once
+      counts = [0] * len(self.index.sigTable)
+      for sig in self.index.sigs:
+        counts[sig] += 1
+      for ii in xrange(len(self.index.sigTable)):
+        self.register([getattr(layer, name) for name in self.index.sigTable[ii]], counts[ii])
+
+      self.packets.extend(xrange(len(self.pcap)))
+    else:
+      self.pcap.scan()
+      for rec in xrange(len(self.pcap)):
+        self.packets.append(rec, self.track(self.decode(rec)))
+
+  # Releases the map of our pcap file
+  # MUST only be called once we are being replaced, nothing not yet decoded can be read afterwards
+  def close(self):
+    if(self.pcap):
+      self.pcap.close()
+      self.pcap = None
+
+  # Scans our pcap file and decodes every record once to learn its layers
+  # Then writes the result to our sidecar index so we never do this again
+  def buildIndex(self):
+    self.pcap.scan()
+    self.index = sidecar.Index(self.pcap)
+    for rec in xrange(len(self.pcap)):
+      self.index.addSig(self.decode(rec).layerSig())
+    sidecar.save(self.fName, self.index)
+
+  # Returns the classes of all layers in our capture in order of first registration
+  def layerClasses(self):
+    return [cls for cls, cnt in self.layerReg.itervalues()]
+
+  # Counts passed layer classes n times in our layer registry
+  def register(self, classes, n=1):
+    for cls in classes:
+      if(cls.ID in self.layerReg):
+        self.layerReg[cls.ID][1] += n
+      else:
+        self.layerReg[cls.ID] = [cls, n]
+        self.layerGen += 1
+
+  # Uncounts passed layer classes once in our layer registry
+  def unregister(self, classes):
+    for cls in classes:
+      self.layerReg[cls.ID][1] -= 1
+      if(self.layerReg[cls.ID][1] < 1):
+        del self.layerReg[cls.ID]
+        self.layerGen += 1
+
+  # Registers the layers of a packet entering our capture
+  # Returns the packet
+  def track(self, pkt):
+    pkt.regLayers = pkt.layerSig()
+    self.register(pkt.regLayers)
+    return pkt
+
+  # Unregisters the layers of a packet leaving our capture
+  def untrack(self, pkt):
+    self.unregister(pkt.regLayers)
+
+  # Updates our registry after the layers of a packet in our capture may have changed
+  def retrack(self, pkt):
+    sig = pkt.layerSig()
+    if(sig != pkt.regLayers):
+      self.register(sig)
+      self.unregister(pkt.regLayers)
+      pkt.regLayers = sig
+
+  # Decodes a record of our pcap file into a packet
+  # Records are already in our layer registry when lazy, so decoding never registers
+  # Takes a record index
+  def decode(self, rec):
+    pkt = packet.Packet(self.dataLink, self.pcap.ts(rec), self.pcap.pkt(rec))
+    pkt.regLayers = pkt.layerSig()
+    if(self.minSize):
+      pkt.minSize = self.minSize
+    if(self.maxSize):
+      pkt.maxSize = self.maxSize
+    return pkt
+
+  # Returns [minSize, maxSize] of packet at zero based index ii without decoding it
+  def pktSizes(self, ii):
+    rec = self.packets.record(ii)
+    if(rec is None or self.packets.isDecoded(ii)):
+      return [self.packets[ii].minSize, self.packets[ii].maxSize]
+
+    caplen = self.pcap.caplens[rec]
+    if(self.minSize):
+      minSize = self.minSize
+    else:
+      minSize = caplen
+    if(self.maxSize):
+      maxSize = self.maxSize
+    else:
+      maxSize = max(dpkt.ethernet.ETH_MTU, caplen)
+    return [minSize, maxSize]
 
   # Is our entire capture RWable?
   def _RW(self):
@@ -74,7 +189,7 @@ class Capture:
 
   # Appends a packet to our capture with now as timestamp
   def append(self, hdr, pkt):
-    self.packets.append(packet.Packet(self.dataLink, time.time(), pkt, len(self.packets) + 1))
+    self.packets.append(self.track(packet.Packet(self.dataLink, time.time(), pkt)))
     
   # For debugging only
   def dump(self):
@@ -83,29 +198,113 @@ class Capture:
       rv += pkt.dump() + "\n"
     return rv
 
+  # Is packet at zero based index ii exactly as it is in our pcap file
+  # Packets not yet decoded always are
+  def pristine(self, ii):
+    rec = self.packets.record(ii)
+    if(rec is None):
+      return False
+    elif(self.packets.isDecoded(ii) and self.packets[ii].dirty):
+      return False
+
+    minSize, maxSize = self.pktSizes(ii)
+    return minSize <= self.pcap.caplens[rec] <= maxSize
+
   # Writes our capture to the passed filehandle
+  # Pristine packets are copied straight from our pcap file, only dirty packets are packed again
   # Not meant to be called externally
-  # Should raise IOError if problems but pcap.Writer does not support it
+  # Raises IOError if problems
   def __write(self, f):
-    out = dpkt.pcap.Writer(f)
-    for pkt in self.packets:
+    out = pcapfile.PcapWriter(f, self.pcap, self.dataLink)
+    for ii in xrange(len(self.packets)):
+      rec = self.packets.record(ii)
+      if(self.pristine(ii)):
+        out.copyRecord(rec)
+        continue
+
+      pkt = self.packets[ii]
       if(pkt.control): # Skip control packets unless they are generators
         if(pkt.control == 'g'):
-          for g in self.expandGenerators(pkt):
-            out.writepkt(dpkt.ethernet.Ethernet.pack(g.data()))
+          self.writeGenerator(out, pkt)
+      elif(rec is None):
+        out.writePkt(pkt.pktStr(), pkt.ts)
       else:
-        out.writepkt(dpkt.ethernet.Ethernet.pack(pkt.data()))
+        out.writeRecord(pkt.pktStr(), self.pcap.secs[rec], self.pcap.fracs[rec])
+    out.flush()
+
+  # Patches dirty records of our pcap file in place
+  # Only possible when saving over the same untouched file we were read from,
+  # nothing has been inserted or removed and no dirty record changes length
+  # Returns False without writing anything if we cannot
+  # Raises IOError if problems
+  def patch(self):
+    if(not self.pcap or self.packets.rearranged or len(self.packets) != len(self.pcap)):
+      return False
+    elif(self.minSize or self.maxSize): # Clean packets may need resizing
+      return False
+
+    try:
+      st = os.stat(self.fName)
+    except OSError:
+      return False
+    if((st.st_dev, st.st_ino, st.st_size, st.st_mtime) != (self.pcap.dev, self.pcap.ino, self.pcap.size, self.pcap.mtime)):
+      return False
+
+    # Nothing has been rearranged, so every record is at its own index
+    patches = []
+    for rec, pkt in self.packets.resident():
+      if(pkt.dirty):
+        if(pkt.control):
+          return False
+        data = pkt.pktStr()
+        if(len(data) != self.pcap.caplens[rec]):
+          return False
+        patches.append((self.pcap.offsets[rec], rec, data))
+
+    if(len(patches) == 0):
+      return True
+    f = open(self.fName, 'r+b')
+    for off, rec, data in sorted(patches):
+      f.seek(off)
+      f.write(data)
+    f.close()
+
+    # Our map already sees what we wrote, bring everything else we know about the file up to date
+    st = os.stat(self.fName)
+    self.pcap.size = st.st_size
+    self.pcap.mtime = st.st_mtime
+    if(self.index):
+      # A patched record may now decode to different layers, our sidecar must list what a reread will find
+      for off, rec, data in patches:
+        self.index.setSig(rec, self.decode(rec).layerSig())
+      self.index.key = sidecar.fileKey(self.pcap)
+      sidecar.save(self.fName, self.index)
+    return True
 
   # Saves our capture file
+  # Dirty records are patched in place when possible, otherwise the whole file is rewritten
   # Raises IOError if problems
   def save(self):
+    if(self.patch()):
+      return
+
+    # Records are copied from the map of our pcap file, so we write beside it and swap it in
+    if(self.pcap):
+      tmpName = self.fName + '.tmp'
+    else:
+      tmpName = self.fName
+
     try:
-      f = open(self.fName, 'wb')
+      f = open(tmpName, 'wb')
     except:
       raise IOError
     else:
       self.__write(f)
       f.close()
+      if(tmpName != self.fName):
+        if(os.path.exists(self.fName)): # Keep the permissions of the file we replace
+          shutil.copymode(self.fName, tmpName)
+        os.rename(tmpName, self.fName)
       
   # Changes our save file to passed arg and then saves to it
   # We don't create directories, only files if they do not exist
@@ -118,55 +317,38 @@ class Capture:
       if(not os.path.isdir(os.path.split(name)[0])):
         return "Error:Directory does not exist"
 
-    try:
-      f = open(name, 'wb')
-    except:
+    # Don't create or clobber name before we've written it
+    if(os.path.exists(name)):
+      if(not os.access(name, os.W_OK)):
+        return "Error:Cannot open file"
+    elif(not os.access(os.path.split(name)[0] or '.', os.W_OK)):
       return "Error:Cannot open file"
-    else:
-      f.close()
-      self.fName = name
-      self.save()
+
+    self.fName = name
+    self.save()
         
   # Yanks packets from main capture and puts them in the clipboard
   # Takes inclusive first and last packets to be yanked as integers(zero based)
   def yank(self, first, last):
-    self.clipboard = []
-    for ii in xrange(first, last + 1):
-      if(first >= len(self.packets)):
-        self.clipboard.append(self.packets.pop())
-      else:
-        self.clipboard.append(self.packets.pop(first))
-    self.resetPIDs(first)
-
-    # Clobber PIDs of yanked packets (Defensive programming)
+    self.clipboard = self.packets.popRange(first, min(last, len(self.packets) - 1))
     for pkt in self.clipboard:
-      for lay in pkt.layers:
-        if(lay.ID == 'pid'):
-          lay.setColumn('pid', -1)
+      self.untrack(pkt)
 
   # Inserts control packets into the capture
   # Can only insert control statement packets
   # Takes a packet type, zero based integer insert point, and single argument dependent on pktType
   def insert(self, pktType, first, arg):
-    self.packets.insert(first, copy.deepcopy(self.packets[first]))
+    self.packets.insert(first, self.packets[first].clone())
     if(pktType == 'sleep'):
       self.packets[first + 1].makeSleep(arg)
     elif(pktType == 'jump'):
       self.packets[first + 1].makeJump(arg)
-    self.resetPIDs(first)
+    self.track(self.packets[first + 1])
 
   # Pastes packets from our clipboard to our main capture
   # Takes the packet at the paste point as an integer(zero based)
   def paste(self, first):
-    for ii in xrange(0, len(self.clipboard)):
-      self.packets.insert(first + ii, copy.deepcopy(self.clipboard[ii]))
-    self.resetPIDs(first)
-
-  # Resets pktIDs from first
-  # Takes starting packet as integer
-  def resetPIDs(self, first):
-    for ii in xrange(first, len(self.packets)):
-      self.packets[ii].layers[0].setColumn('pid', ii + 1)
+    self.packets.insertRange(first, [self.track(pkt.clone()) for pkt in self.clipboard])
 
   # Sets the interface for sending and capturing
   def setInterface(self, name):
@@ -191,26 +373,67 @@ class Capture:
   # Takes a packet obj with generator
   # Returns list of packets with all generators expanded
   def expandGenerators(self, gPkt):
-    numPkts = 0
-    for lay in gPkt.genLayers: # Determine how many packets to generate
-      for col in lay.gen:
-        numPkts = max(numPkts, lay.gen[col]['count'])
-
+    numPkts = gPkt.genCount
     if(numPkts == 0 or numPkts == 1):
       return [gPkt]
     else:
-      rv = []
-      for ii in xrange(numPkts):
-        pkt = copy.deepcopy(gPkt)
-        for lay in pkt.layers[0:]: # Ignore pktID
-          for col,gDef in lay.gen.iteritems():
-            lay.incColumn(col, (ii % gDef['count']) * gDef['step'])
-            del lay.gen[col]['count']
-            del lay.gen[col]['step']
-            del lay.gen[col]['mask']
-          
-        rv.append(pkt)
-      return rv
+      return [gPkt.expand(ii) for ii in xrange(numPkts)]
+
+  # Takes a packet obj with generator that expands to more than one packet
+  # Returns its compiled Template or None if it cannot be compiled, see template.py
+  # Generator packets are compiled once per version
+  def genTemplate(self, gPkt):
+    key = (gPkt.version, gPkt.minSize, gPkt.maxSize)
+    cached = self.templates.get(gPkt)
+    if(not cached or cached[0] != key):
+      cached = [key, template.compile(gPkt, gPkt.genCount)]
+      self.templates[gPkt] = cached
+    return cached[1]
+
+  # Takes a packet obj with generator
+  # Returns a bulk.Expander for it, or None if it is too small to bother or cannot be expanded in bulk
+  def genExpander(self, gPkt):
+    if(gPkt.genCount < cfg.bulkSize or not bulk.available()):
+      return None
+    tpl = self.genTemplate(gPkt)
+    if(tpl):
+      return bulk.Expander(tpl)
+    return None
+
+  # Takes a packet obj with generator
+  # Yields every packet it expands to as a string ready for a pcap record or the wire
+  def genFrames(self, gPkt):
+    numPkts = gPkt.genCount
+    if(numPkts == 0 or numPkts == 1):
+      yield gPkt.pktStr()
+      return
+
+    expander = self.genExpander(gPkt)
+    if(expander):
+      for block in expander.blocks():
+        for row in block:
+          yield row.tostring()
+      return
+
+    tpl = self.genTemplate(gPkt)
+    if(tpl):
+      for frame in tpl.frames():
+        yield frame
+    else:
+      for pkt in self.expandGenerators(gPkt):
+        yield pkt.pktStr()
+
+  # Writes every packet passed generator packet expands to with passed pcapfile.PcapWriter
+  # Large generators are written a block of records at a time
+  def writeGenerator(self, out, gPkt):
+    expander = self.genExpander(gPkt)
+    if(expander):
+      hdr = out.recHeader(len(expander.base), gPkt.ts)
+      for block in expander.blocks():
+        out.write(bulk.records(block, hdr))
+    else:
+      for frame in self.genFrames(gPkt):
+        out.writePkt(frame, gPkt.ts)
 
   # Function for sending a single packet, either normal or generator
   # Takes a packet object to send
@@ -221,13 +444,13 @@ class Capture:
 
     sentPkts = 0
     if(pkt.control == 'g'): # It has a generator
-      for p in self.expandGenerators(pkt):
-        if(self.iface.send(str(p.data())) == -1):
+      for frame in self.genFrames(pkt):
+        if(self.iface.send(frame) == -1):
           return False
         else:
           sentPkts += 1
     else:
-      if(self.iface.send(str(pkt.data())) == -1):
+      if(self.iface.send(pkt.pktStr()) == -1):
         return False
       else:
         return 1
@@ -268,28 +491,27 @@ class Capture:
 
   # get and set for minSize of every packet in capture
   def _get_minPktSize(self):
-    rv = self.packets[0].minSize
-    for pkt in self.packets:
-      if(rv > pkt.minSize):
-        rv = pkt.minSize
+    rv = self.pktSizes(0)[0]
+    for ii in xrange(len(self.packets)):
+      rv = min(rv, self.pktSizes(ii)[0])
     return rv
 
+  # Packets decoded later pick up self.minSize in decode()
   def _set_minPktSize(self, s):
     self.minSize = s
-    for pkt in self.packets:
+    for ii, pkt in self.packets.decoded():
       pkt.minSize = s
   minPktSize = property(_get_minPktSize, _set_minPktSize)
 
   # get and set for maxSize of every packet in capture
   def _get_maxPktSize(self):
     rv = 0
-    for pkt in self.packets:
-      if(rv < pkt.maxSize):
-        rv = pkt.maxSize
+    for ii in xrange(len(self.packets)):
+      rv = max(rv, self.pktSizes(ii)[1])
     return rv
 
   def _set_maxPktSize(self, s):
     self.maxSize = s
-    for pkt in self.packets:
+    for ii, pkt in self.packets.decoded():
       pkt.maxSize = s
   maxPktSize = property(_get_maxPktSize, _set_maxPktSize)
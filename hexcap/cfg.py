@@ -52,35 +52,34 @@ def hexStrToBinStr(s):
       break
   return ''.join('0' * leadZeros) + bin(int('0x' + s, 16)).split('0b')[1]
 
-# Increments a hexStr(hs) by step respecting passed mask
-# Returns incremented hexStr respecting delimters
-def incHexStr(hs, mask, step=1):
-  if(len(hs) != len(mask)):
-    dbg("Fatal Length Error in incHex()")
-
-  if(step > 0):
-    for ii in xrange(step):
-      for jj in xrange(len(hs) - 1, 0, -1):
-        if(ord(hs[jj]) in hexChars):
-          if(hs[jj] == 'f'):
-            hs = hs[:jj] + '0' + hs[jj+1:]
-          elif(int(hs[jj], 16) | int(mask[jj], 16) != 15):
-            hs = hs[:jj] + hex(int(hs[jj], 16) + 1)[2] + hs[jj+1:]
-            break
-  else:
-    for ii in xrange(0, step, -1):
-      for jj in xrange(len(hs) - 1, 0, -1):
-        if(ord(hs[jj]) in hexChars):
-          if(hs[jj] == '0'):
-            hs = hs[:jj] + 'f' + hs[jj+1:]
-          elif(int(hs[jj], 16) | int(mask[jj], 16) != int(mask[jj], 16)):
-            hs = hs[:jj] + hex(int(hs[jj], 16) - 1)[2] + hs[jj+1:]
-            break
-  return hs
-
 # We can't count past 99,999
 pktIDWidth = 5
 
+# Captures larger than this many bytes are decoded on demand
+lazySize = 64 * 1024 * 1024
+
+# Maximum number of decoded packets kept around for on demand captures
+lruSize = 4096
+
+# Packet lists are kept in chunks of about this many packets
+# Inserting or removing packets only moves packets of the chunks they touch
+chunkSize = 1024
+
+# How many screens worth of packets our ncurses pad holds
+ppadScreens = 3
+
+# Sidecar index for on demand captures is kept in fName + idxSuffix
+idxSuffix = '.hxidx'
+
+# Decode common frames straight from their bytes instead of through dpkt, see dissect.py
+fastDissect = True
+
+# Saving collects this many bytes before writing them out
+writeBufSize = 1024 * 1024
+
+# Generators expanding to at least this many packets are expanded in bulk if NumPy is installed
+bulkSize = 4096
+
 # Allowed hexidecimal characters
 # Can't use string.hexdigits since it has caps
 hexChars = []
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+'''Counting on delimited hex strings with a mask, as generators do'''
+
+# hexcap specific imports
+import cfg
+
+# Hex digits in the order we count them
+hexDigits = '0123456789abcdef'
+
+# Counting works one hex digit at a time, least significant first, and never touches
+# the first character of a string or any delimiter
+# Counting up a digit goes 'f' to '0' and carries, else adds 1 unless every bit not in
+# its mask digit is already set, then the digit is stuck and every count carries on
+# Counting down a digit goes '0' to 'f' and borrows, else subtracts 1 unless it has no
+# bits outside its mask digit, then the digit is stuck and every count borrows on
+# Digits with a mask digit of 0 never stick, runs of them count as a single integer
+# Digits with any other mask digit are looked up in _walks
+
+# Counts digit d under mask digit m once, up if up is True else down
+# Returns the new digit and whether we carry or borrow into the next digit
+def _nudge(d, m, up):
+  if(up):
+    if(d == 15):
+      return 0, True
+    elif(d | m != 15):
+      return d + 1, False
+  else:
+    if(d == 0):
+      return 15, True
+    elif(d | m != m):
+      return d - 1, False
+  return d, True
+
+# Returns [digit, carries] for digit d under nonzero mask digit m after 0, 1, 2.. counts
+# Stops where the digit sticks, every count past the last entry just carries on
+def _walk(d, m, up):
+  rv = [[d, 0]]
+  while(True):
+    nd, carry = _nudge(rv[-1][0], m, up)
+    if(nd == rv[-1][0]):
+      return rv
+    rv.append([nd, rv[-1][1] + int(carry)])
+
+# _walks[up][m][d] is _walk(d, m, up), mask digit 0 never sticks and has no entry
+_walks = {}
+for up in (True, False):
+  _walks[up] = [None] + [[_walk(d, m, up) for d in xrange(16)] for m in xrange(1, 16)]
+
+# A hex string that counts respecting a mask
+# The string is parsed once, then count() returns it counted any number of times
+class Counter:
+  # Takes a hex string and its mask as hex string delimited the same way
+  def __init__(self, hs, mask):
+    if(len(hs) != len(mask)):
+      cfg.dbg("Fatal Length Error in Counter()")
+
+    self.hs = hs
+    # Parts of hs we count, least significant first
+    # [mask digit, width, value, digits] for a masked digit or a run of unmasked digits
+    # Runs of unmasked digits have a mask digit of 0
+    self.parts = []
+    self.fmt = '' # hs with every digit we count replaced with %s
+    run = ''
+    for jj in xrange(len(hs) - 1, 0, -1):
+      if(hs[jj] in hexDigits):
+        self.fmt = '%s' + self.fmt
+        m = int(mask[jj], 16)
+        if(m == 0):
+          run = hs[jj] + run
+        else:
+          self.addRun(run)
+          run = ''
+          self.parts.append([m, 1, int(hs[jj], 16), hs[jj]])
+      else:
+        self.fmt = hs[jj].replace('%', '%%') + self.fmt
+    self.addRun(run)
+    self.fmt = hs[:1].replace('%', '%%') + self.fmt
+
+  # Adds passed run of unmasked digits to our parts
+  # SHOULD never be called outside of class
+  def addRun(self, run):
+    if(len(run) > 0):
+      self.parts.append([0, len(run), int(run, 16), run])
+
+  # Returns our hex string counted step times, up if step is positive else down
+  def count(self, step):
+    if(step == 0 or len(self.parts) == 0):
+      return self.hs
+
+    up = step > 0
+    carries = abs(step)
+    rv = []
+    for m, width, val, digits in self.parts:
+      if(carries == 0):
+        rv.append(digits)
+      elif(m == 0):
+        span = 16 ** width
+        if(up):
+          val += carries
+        else:
+          val -= carries
+        carries = abs(val // span)
+        rv.append('%0*x' % (width, val % span))
+      else:
+        walk = _walks[up][m][val]
+        if(carries < len(walk)):
+          d, carries = walk[carries]
+        else:
+          d, carries = walk[-1][0], walk[-1][1] + carries - len(walk) + 1
+        rv.append(hexDigits[d])
+    rv.reverse()
+    return self.fmt % tuple(''.join(rv))
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+'''Decodes common frames straight from their bytes without building dpkt objects'''
+
+import struct
+
+# hexcap specific imports
+import layer
+
+# Headers we decode, all in network byte order
+ethHdr = struct.Struct('!6s6sH')
+vlanHdr = struct.Struct('!HH')
+arpHdr = struct.Struct('!HHBBH6s4s6s4s')
+ipHdr = struct.Struct('!BBHHHBBH4s4s')
+ip6Hdr = struct.Struct('!IHBB16s16s')
+tcpHdr = struct.Struct('!HHIIBBHHH')
+udpHdr = struct.Struct('!HHHH')
+icmpHdr = struct.Struct('!BBH')
+echoHdr = struct.Struct('!HH')
+
+# Header fields named as dpkt names them
+# Our layers take these just as they take dpkt objects
+class Fields(object):
+  def __init__(self, **kwargs):
+    self.__dict__ = kwargs
+
+# Returns layers for passed frame of link type dlt
+# Returns None for any frame we cannot decode exactly as dpkt would, the caller must then use dpkt
+# We only decode Ethernet II with up to two 802.1q tags carrying ARP, or IPv4 or IPv6
+# carrying TCP, UDP or ICMP echo, everything else is left to dpkt
+def dissect(dlt, buf):
+  if(dlt != 1 or len(buf) < ethHdr.size):
+    return None
+
+  dst, src, etype = ethHdr.unpack_from(buf)
+  if(etype <= 1500 or etype in (0x88a8, 0x9100, 0x9200)): # 802.3 and other tag types
+    return None
+
+  # Like Packet.initLayers() our 802.1q layers come before our Ethernet layer
+  rv = []
+  off = ethHdr.size
+  nxt = etype
+  if(etype == 0x8100):
+    for ii in xrange(2):
+      if(len(buf) < off + vlanHdr.size):
+        return None
+      tci, nxt = vlanHdr.unpack_from(buf, off)
+      off += vlanHdr.size
+      rv.append(layer.Dot1q(Fields(id=tci & 0x0fff, pri=tci >> 13, cfi=(tci >> 12) & 1, type=nxt)))
+      if(nxt != 0x8100):
+        break
+  rv.append(layer.EthernetII(Fields(dst=dst, src=src, type=etype)))
+
+  if(nxt == 0x0800):
+    upper = ipv4(buf, off)
+  elif(nxt == 0x86dd):
+    upper = ipv6(buf, off)
+  elif(nxt == 0x0806):
+    upper = arp(buf, off)
+  else:
+    return None
+
+  if(upper is None):
+    return None
+  return rv + upper
+
+# Each of the following takes the frame and the offset of its header
+# Each returns a list of layers from its header on, or None if dpkt must decode the frame
+
+def arp(buf, off):
+  if(len(buf) < off + arpHdr.size):
+    return None
+  hrd, pro, hln, pln, op, sha, spa, tha, tpa = arpHdr.unpack_from(buf, off)
+  return [layer.ARP(Fields(op=op, sha=sha, spa=spa, tha=tha, tpa=tpa))]
+
+# Fragments that are not the first carry no header dpkt decodes
+def ipv4(buf, off):
+  if(len(buf) < off + ipHdr.size):
+    return None
+  vhl, tos, ln, ident, frag, ttl, p, csum, src, dst = ipHdr.unpack_from(buf, off)
+  hl = vhl & 0xf
+  if(hl < 5 or frag & 0x1fff or not p in transports):
+    return None
+
+  start = off + hl * 4
+  if(ln):
+    seg = buf[start:off + ln]
+  else: # Like dpkt, a length of 0 is likely TCP segmentation offload
+    seg = buf[start:]
+  upper = transports[p](seg)
+  if(upper is None):
+    return None
+
+  opts = buf[off + ipHdr.size:start]
+  return [layer.IPv4(Fields(dst=dst, src=src, p=p, ttl=ttl, tos=tos, off=frag, hl=hl, v=vhl >> 4,
+                            len=ln, id=ident, opts=opts))] + upper
+
+# Extension headers are left to dpkt
+def ipv6(buf, off):
+  if(len(buf) < off + ip6Hdr.size):
+    return None
+  vfc, plen, nxt, hlim, src, dst = ip6Hdr.unpack_from(buf, off)
+  if(not nxt in (6, 17)):
+    return None
+
+  start = off + ip6Hdr.size
+  if(plen):
+    seg = buf[start:start + plen]
+  else: # Jumbo payload or TCP segmentation offload
+    seg = buf[start:]
+  upper = transports[nxt](seg)
+  if(upper is None):
+    return None
+
+  return [layer.IPv6(Fields(dst=dst, src=src, nxt=nxt, hlim=hlim, fc=(vfc >> 20) & 0xff, flow=vfc & 0xfffff,
+                            v=vfc >> 28, plen=plen))] + upper
+
+# Transport protocols take only their segment as a string
+
+def tcp(seg):
+  if(len(seg) < tcpHdr.size):
+    return None
+  sport, dport, seq, ack, offx2, flags, win, csum, urp = tcpHdr.unpack_from(seg)
+  end = (offx2 >> 4) * 4
+  if(end < tcpHdr.size):
+    return None
+  return [layer.TCP(Fields(sport=sport, dport=dport, seq=seq, ack=ack, off=offx2 >> 4, flags=flags, win=win,
+                           opts=seg[tcpHdr.size:end], data=seg[end:]))]
+
+def udp(seg):
+  if(len(seg) < udpHdr.size):
+    return None
+  sport, dport, ulen, csum = udpHdr.unpack_from(seg)
+  return [layer.UDP(Fields(sport=sport, dport=dport, ulen=ulen, data=seg[udpHdr.size:]))]
+
+# Our ICMP layer only knows echo and echo reply
+def icmp(seg):
+  if(len(seg) < icmpHdr.size + echoHdr.size):
+    return None
+  icmpType, code, csum = icmpHdr.unpack_from(seg)
+  if(not icmpType in (0, 8)):
+    return None
+  ident, seq = echoHdr.unpack_from(seg, icmpHdr.size)
+  echo = Fields(id=ident, seq=seq, data=seg[icmpHdr.size + echoHdr.size:])
+  return [layer.ICMP(Fields(type=icmpType, data=echo))]
+
+# IP protocol numbers of transports we decode
+transports = {1: icmp, 6: tcp, 17: udp}
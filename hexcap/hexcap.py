@@ -123,8 +123,10 @@ while True:
         except IOError:
           mainScr.mBufMsg = "Error reading file: " + pc.fName
         else:
-          pc = capture.Capture(f, pc.fName)
+          newPc = capture.Capture(f, pc.fName)
           f.close()
+          pc.close() # The file may have been replaced since, so its old map is released
+          pc = newPc
           mainScr.initPad(pc)
 
       elif(curses.keyname(c) == '^N'): # Toggle INS/NAV mode
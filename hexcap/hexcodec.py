@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+'''Converts packet bytes to delimited hex strings and back'''
+
+import binascii
+
+# Two hex digits for every byte value, both indexed by ord() and keyed by character
+byteHex = ['%02x' % ii for ii in xrange(256)]
+charHex = dict([(chr(ii), byteHex[ii]) for ii in xrange(256)])
+
+# Character for every two lower case hex digits
+hexChar = dict([(byteHex[ii], chr(ii)) for ii in xrange(256)])
+
+# Returns passed string of bytes as hex with delim between every ln nibbles
+# ln is rounded up to whole bytes and bytes short of a whole group at the end are dropped
+def toHex(data, delim, ln=2):
+  if(ln <= 2):
+    return delim.join(map(charHex.__getitem__, data))
+
+  width = (ln + 1) // 2
+  hs = binascii.hexlify(data[:len(data) - len(data) % width])
+  width *= 2
+  return delim.join([hs[ii:ii + width] for ii in xrange(0, len(hs), width)])
+
+# Returns passed hex string with delim between every ln nibbles as a string of bytes
+# Returns False if ln is not a positive even number
+def fromHex(s, delim, ln=2):
+  if((ln % 2 != 0) or (ln < 2)):
+    return False
+
+  groups = s.split(delim)
+  try:
+    if(ln == 2):
+      return ''.join(map(hexChar.__getitem__, groups))
+    for group in groups:
+      if(len(group) != ln):
+        return _fromHexGroups(groups, ln)
+    return binascii.unhexlify(''.join(groups))
+  except (KeyError, TypeError):
+    return _fromHexGroups(groups, ln)
+
+# Converts hex groups of ln nibbles a byte at a time
+# Only for groups that are not all exactly ln lower case hex digits, which int() may still take
+# SHOULD never be called outside of module
+def _fromHexGroups(groups, ln):
+  if(ln != 2):
+    groups = [group[ii:ii + 2] for group in groups for ii in xrange(0, ln, 2)]
+  return ''.join([chr(int(group, 16)) for group in groups])
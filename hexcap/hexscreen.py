@@ -10,7 +10,8 @@ import math
 import curses
 import locale
 import sys
-import copy
+import weakref
+import bisect
 from time import sleep
 
 # hexcap specific imports
@@ -21,6 +22,10 @@ import packet
 import layer
 import section
 
+# Characters our cursor may rest on
+# Hex digits for editing, '-' for hidden sections and '.' for the undefined layer
+cursorChars = frozenset([chr(c) for c in cfg.hexChars] + ['-', '.'])
+
 # Our generic ScreenError exception class
 class ScreenError(Exception):
   def __init__(self, msg):
@@ -59,6 +64,9 @@ class HexScreen:
     # Message to be printed to mBuf for one cycle and then cleared
     self.mBufMsg = ''
 
+    # Rendered packet lines, see drawPkt()
+    self.lineCache = weakref.WeakKeyDictionary()
+
   def tearDown(self, dieStr=''):
     self.stdscr.keypad(0)
     curses.echo()
@@ -74,10 +82,10 @@ class HexScreen:
     self.maxY, self.maxX = self.stdscr.getmaxyx()
     self.ppadTopY = self.headerHeight # Topmost ppad position on screen
     self.ppadBottomY = self.maxY - self.footerHeight # Bottommost ppad position on screen
-    self.ppadRows = len(self.cap.packets) # Total number of lines in ppad 
+    self.ppadRows = len(self.cap.packets) # Total number of packet lines, only winRows of them are in ppad
     self.buildSections()
-    self.drawPpads()
     self.initCursor()
+    self.drawPpads()
     self.refresh()
 
   # Initialize all cursor attributes
@@ -88,25 +96,80 @@ class HexScreen:
     self.ppadCurX = 0 # Current leftmost visible X in ppad
 
   # Completely redraws our ppad and rebuilds our section list
+  # Our ppad only holds a window of winRows packets starting at packet winTop
   # Sets ppadWidth
   def drawPpads(self):
-    if(self.ppadRows != len(self.cap.packets)): # Our capture has changed in size
+    if(self.sectGen != self.cap.layerGen): # A layer has entered or left our capture
       self.buildSections()
 
     # Draw our packet ppad
+    self.buildGeometry()
     self.ppadRows = len(self.cap.packets)
     self.ppadWidth = self.tableWidth + 1 # Don't understand, why the extra 1?
-    self.ppad = curses.newpad(self.ppadRows, self.ppadWidth)
+    self.winRows = max(1, min(self.ppadRows, cfg.ppadScreens * (self.ppadBottomY - self.ppadTopY)))
+    self.ppad = curses.newpad(self.winRows, self.ppadWidth)
     self.stdscr.clear()
-    self.ppad.clear()
-    y = 0
-    for p in self.cap.packets:
-      self.drawPktLine(y, p.out())
-      y += 1
+    self.layoutKey = tuple((s.ID, s.exposed) for s in self.sections if s.visible)
+    self.drawWindow()
 
     # Create our header ppad
     self.headPpad = curses.newpad(2, self.ppadWidth)
 
+  # Centers our ppad window on the visible packets and draws every packet in it
+  def drawWindow(self):
+    margin = (self.winRows - (self.ppadBottomY - self.ppadTopY)) // 2
+    self.winTop = max(0, min(self.ppadCurY - margin, self.ppadRows - self.winRows))
+    self.ppad.erase()
+
+    if(self.markSet):
+      markFirst = min(self.mark, self.ppadCY)
+      markLast = max(self.mark, self.ppadCY)
+    for y in xrange(self.winTop, min(self.winTop + self.winRows, self.ppadRows)): # An empty capture draws nothing
+      if(self.markSet and markFirst <= y <= markLast):
+        self.drawPkt(y, False, True)
+      else:
+        self.drawPkt(y)
+
+  # Redraws our ppad window if visible packets have scrolled out of it
+  def scrollWindow(self):
+    lastY = min(self.ppadRows, self.ppadCurY + self.ppadBottomY - self.ppadTopY)
+    if(self.ppadCurY < self.winTop or lastY > self.winTop + self.winRows):
+      self.drawWindow()
+
+  # Draws packet at zero based index y if it is within our ppad window and our capture
+  # Rendered lines are cached against packet version, section layout and line
+  # So redrawing an unchanged packet with a different attribute never reformats it
+  def drawPkt(self, y, bold=False, reverse=False):
+    if(self.winTop <= y < min(self.winTop + self.winRows, self.ppadRows)):
+      self.drawSegments(y, self.pktLine(y)[2], bold, reverse)
+
+  # Returns the line cache entry for packet y, rendering it if necessary
+  # Entries are [version, layoutKey, segments, text, cursor stops, line]
+  # Text and cursor stops are only built once cursor movement or insertion asks for them
+  # Our pid is our line, so a packet that moved is rendered again
+  def pktLine(self, y):
+    pkt = self.cap.packets[y]
+    cached = self.lineCache.get(pkt)
+    if(not cached or cached[0] != pkt.version or cached[1] != self.layoutKey or cached[5] != y):
+      cached = [pkt.version, self.layoutKey, self.lineSegments(pkt.out(y + 1)), None, None, y]
+      self.lineCache[pkt] = cached
+    return cached
+
+  # Returns packet line y as it is drawn on our ppad, indexed by ppad X
+  def lineText(self, y):
+    cached = self.pktLine(y)
+    if(cached[3] is None):
+      cached[3] = ''.join([seg[1] for seg in cached[2]])
+    return cached[3]
+
+  # Returns sorted list of ppad X values on packet line y our cursor may rest on
+  def lineStops(self, y):
+    cached = self.pktLine(y)
+    if(cached[4] is None):
+      txt = self.lineText(y)
+      cached[4] = [x for x in xrange(len(txt)) if txt[x] in cursorChars]
+    return cached[4]
+
   def refresh(self):
     #    cfg.dbg("hexscreen.py refresh tw:" + str(self.tableWidth) + " ppadCurX:" + str(self.ppadCurX) + " maxX:" + str(self.maxX))
     if(curses.is_term_resized(self.maxY, self.maxX)):
@@ -131,9 +194,10 @@ class HexScreen:
       self.mBufMsg = ''
       self.stdscr.move(self.cY, self.cX)
 
+    self.scrollWindow()
     self.refreshBoldPacket()
     self.headPpad.refresh(0, self.ppadCurX, 0, 0, self.headerHeight, self.maxX - 1)
-    self.ppad.refresh(self.ppadCurY, self.ppadCurX, self.ppadTopY, 0, self.ppadBottomY, self.maxX - 1)
+    self.ppad.refresh(self.ppadCurY - self.winTop, self.ppadCurX, self.ppadTopY, 0, self.ppadBottomY, self.maxX - 1)
     self.stdscr.refresh()
     curses.doupdate()
 
@@ -147,35 +211,32 @@ class HexScreen:
           hiddenSections.append(s.ID)
 
     self.sections = []
-    IDs = [] # Holds temp list of sections we've added to self.sections
-    for pkt in self.cap.packets:
-      for lay in pkt.layers:
-        if(not(lay.ID in IDs)):
-          IDs.append(lay.ID)
-
-          # Construct our new section
-          s = section.Section(lay.ID, lay.position)
-          for col,width in lay.cols.iteritems():
-            s.append(col, width)
-          # non-default values for layers need to be handled here
-          if(s.ID in hiddenSections): 
-            s.exposed = False
-          else:
-            s.exposed = lay.exposed
-          s.exposable = lay.exposable
-          s.RO = lay.RO
+    self.sectGen = self.cap.layerGen
+    for lay in self.cap.layerClasses():
+      # Construct our new section
+      s = section.Section(lay.ID, lay.position)
+      for col,width in lay.cols.iteritems():
+        s.append(col, width)
+      # non-default values for layers need to be handled here
+      if(s.ID in hiddenSections): 
+        s.exposed = False
+      else:
+        s.exposed = lay.exposed
+      s.exposable = lay.exposable
+      s.RO = lay.RO
 
-          # append/insert our new section
-          if(len(self.sections) <= 1):
+      # append/insert our new section
+      if(len(self.sections) <= 1):
+        self.sections.append(s)
+      else:
+        for ii in xrange(len(self.sections)):
+          if(ii == len(self.sections) - 1):
             self.sections.append(s)
-          else:
-            for ii in xrange(len(self.sections)):
-              if(ii == len(self.sections) - 1):
-                self.sections.append(s)
-                break
-              elif(s.position <= self.sections[ii].position):
-                self.sections.insert(ii, s)
-                break
+            break
+          elif(s.position <= self.sections[ii].position):
+            self.sections.insert(ii, s)
+            break
+    self.buildGeometry()
 
   # Relative Y cursor position in our ppad
   def _get_ppadCY(self):
@@ -187,94 +248,97 @@ class HexScreen:
     return self.ppadCurX + self.cX
   ppadCX = property(_get_ppadCX)
 
+  # Rebuilds our table of section and column positions
+  # MUST be called whenever sections are rebuilt, exposed or hidden
+  # All positions in here are ppad X values, not screen X values
+  def buildGeometry(self):
+    self.dSections = [] # Ordered list of displayed sections
+    self.sectByID = {} # Displayed sections keyed by section ID
+    self.sectLefts = {} # Leftmost X of each displayed section keyed by section ID
+    self.sectStarts = [] # Leftmost X of each displayed section in display order
+    self.colBounds = [] # Sorted X values where each entry of colEntries takes over
+    self.colEntries = [] # [section, column ID, leftmost X, width], column ID is None for hidden sections
+    self.colByID = {} # Entries of colEntries for exposed columns keyed by (section ID, column ID)
+
+    x = 0
+    for s in self.sections:
+      if(not s.visible):
+        continue
+      self.dSections.append(s)
+      self.sectByID[s.ID] = s
+      self.sectLefts[s.ID] = x
+      self.sectStarts.append(x)
+
+      # The '|' left of a column belongs to that column, see cursorColumn()
+      if(s.exposed):
+        colX = x
+        for col, cWidth in s.c.iteritems():
+          self.colBounds.append(colX - 1)
+          self.colEntries.append([s, col, colX, cWidth])
+          self.colByID[(s.ID, col)] = self.colEntries[-1]
+          colX += cWidth + 1
+      else:
+        self.colBounds.append(x - 1)
+        self.colEntries.append([s, None, x, s.width - 1])
+      x += s.width
+
+    self._tableWidth = max(1, x)
+
+    self._offLimitsWidth = False
+    self._offLimitsSections = 0
+    rv = 0
+    for s in self.dSections:
+      if(s.RO):
+        rv += s.width
+        self._offLimitsSections += 1
+      else:
+        self._offLimitsWidth = rv
+        break
+
   # An ordered list of displayed sections
   def _get_displayedSections(self):
-    rv = []
-    for s in self.sections:
-      if(s.visible):
-        rv.append(s)
-    return rv
+    return self.dSections
   displayedSections = property(_get_displayedSections)
 
   # Table width of the entire displayed table
   def _get_tableWidth(self):
-    rv = 0
-    for s in self.displayedSections:
-      rv += s.width
-    return max(1, rv)
+    return self._tableWidth
   tableWidth = property(_get_tableWidth)
 
  # Leftmost width that is off limits to cursor
   def _get_offLimitsWidth(self):
-    rv = 0
-    for s in self.displayedSections:
-      if(s.RO):
-        rv += s.width
-      else:
-        return rv
-    return False
+    return self._offLimitsWidth
   offLimitsWidth = property(_get_offLimitsWidth)
 
  # Leftmost sections that are off limits to cursor
   def _get_offLimitsSections(self):
-    rv = 0
-    for s in self.displayedSections:
-      if(s.RO):
-        rv += 1
-      else:
-        return rv
-    return rv
+    return self._offLimitsSections
   offLimitsSections = property(_get_offLimitsSections)
 
   # Returns header section that cursor X value is currently in
   # Takes X value of cursor
   def cursorSection(self, x):
-    dSections = self.displayedSections
-    totX = self.ppadCurX * -1
-    for s in dSections:
-      if(x < totX + s.width):
-        return s
-      else:
-        totX += s.width
-    return dSections.reversed.next()
+    ii = bisect.bisect_right(self.sectStarts, self.ppadCurX + x) - 1
+    return self.dSections[max(0, ii)]
 
   # Returns header section and column key that passed X value is currently in
   # Takes X screen position
   def cursorColumn(self, x):
-    totX = self.ppadCurX * -1
-    for s in self.displayedSections:
-      if(x < totX + s.width - 1):
-        if(s.exposed):
-          for col, cWidth in s.c.iteritems():
-            if(x < totX + cWidth):
-              return list((s, col))
-            else:
-              totX += cWidth + 1
-        else:
-          return list((s, None))
-      else:
-        totX += s.width
+    ii = bisect.bisect_right(self.colBounds, self.ppadCurX + x) - 1
+    s, col, colX, cWidth = self.colEntries[max(0, ii)]
+    return list((s, col))
 
   # Returns leftmost screen X value for passed section name
   def sectionLeft(self, sid):
-    rv = self.ppadCurX * -1
-    for s in self.displayedSections:
-      if(s.ID == sid):
-        return rv
-      else:
-        rv += s.width
-    raise ScreenError, "sectionLeft:Section not found"
+    if(not sid in self.sectLefts):
+      raise ScreenError, "sectionLeft:Section not found"
+    return self.sectLefts[sid] - self.ppadCurX
 
   # Returns center screen X value for passed section name
   def sectionCenter(self, sid):
-    rv = self.ppadCurX * -1
-    for s in self.displayedSections:
-      if(s.ID == sid):
-        c = rv + (int(math.floor(s.width / 2)))
-        return c
-      else:
-        rv += s.width
-    raise ScreenError, "sectionCenter:Section not found"
+    if(not sid in self.sectLefts):
+      raise ScreenError, "sectionCenter:Section not found"
+    return self.sectLefts[sid] - self.ppadCurX + (int(math.floor(self.sectByID[sid].width / 2)))
 
   # Returns leftmost screen X value(after "|") for passed section and column name
   # If column is None then returns leftmost screen X value(after "|") for section only
@@ -282,109 +346,115 @@ class HexScreen:
     rv = self.sectionLeft(sid)
     if(cid == None):
       return rv
-
-    for s in self.displayedSections:
-      if(s.ID == sid):
-        if(s.exposed):
-          for col, width in s.c.iteritems():
-            if(col == cid):
-              return rv
-            else:
-              rv += width + 1
-        else:
-          return rv
+    elif(not self.sectByID[sid].exposed):
+      return rv
+    elif((sid, cid) in self.colByID):
+      return self.colByID[(sid, cid)][2] - self.ppadCurX
     raise ScreenError, "columnLeft:Column not found"
 
   # Returns rightmost screen X value(before "|") for passed section and column name
   def columnRight(self, sid, cid):
-    for s in self.displayedSections:
-      if(s.ID == sid):
-        if(s.exposed):
-          return self.columnLeft(sid, cid) + s.c[cid] - 1
-        else:
-          return self.sectionLeft(sid) + s.width - 1
+    if(not sid in self.sectByID):
+      return None
+    elif(self.sectByID[sid].exposed):
+      return self.columnLeft(sid, cid) + self.colByID[(sid, cid)][3] - 1
+    else:
+      return self.sectionLeft(sid) + self.sectByID[sid].width - 1
 
   # Handle regular refreshing of packet lines
   # cfg.dbg("refreshBoldPacket markSet:" + str(self.markSet) + " mark:" + str(self.mark) + " ppadCY:" + str(self.ppadCY) + " pkts:" + str(len(self.cap.packets)))
   def refreshBoldPacket(self):
     if(len(self.cap.packets) == 1):
       if(self.markSet):
-        self.drawPktLine(0, self.cap.packets[0].out(), True, True)
+        self.drawPkt(0, True, True)
       else:
-        self.drawPktLine(0, self.cap.packets[0].out(), True, False)
+        self.drawPkt(0, True, False)
       return
 
     if(self.markSet):
-      self.drawPktLine(self.ppadCY, self.cap.packets[self.ppadCY].out(), False, True)
+      self.drawPkt(self.ppadCY, False, True)
 
       if(self.ppadCY < self.mark): # Cursor is above mark
         if(self.ppadCY > 0):
-          self.drawPktLine(self.ppadCY - 1, self.cap.packets[self.ppadCY - 1].out())
-        for pkt in xrange(self.mark, self.ppadCY + 1, -1):
-          self.drawPktLine(pkt, self.cap.packets[pkt].out(), False, True)
+          self.drawPkt(self.ppadCY - 1)
+        for pkt in xrange(min(self.mark, self.winTop + self.winRows - 1), max(self.ppadCY, self.winTop - 1), -1):
+          self.drawPkt(pkt, False, True)
         if(self.mark < len(self.cap.packets) - 1):
-          self.drawPktLine(self.mark + 1, self.cap.packets[self.mark + 1].out())
+          self.drawPkt(self.mark + 1)
 
       elif(self.ppadCY == self.mark): # Cursor is on mark
         if(self.mark > 0):
-          self.drawPktLine(self.ppadCY - 1, self.cap.packets[self.ppadCY - 1].out()) 
+          self.drawPkt(self.ppadCY - 1) 
         if(self.mark < len(self.cap.packets) - 1):
-          self.drawPktLine(self.ppadCY + 1, self.cap.packets[self.ppadCY + 1].out()) ##
+          self.drawPkt(self.ppadCY + 1) ##
 
       elif(self.ppadCY > self.mark): # Cursor is below mark
         if(self.mark > 0):
-          self.drawPktLine(self.mark - 1, self.cap.packets[self.mark - 1].out()) 
-        for pkt in xrange(self.mark, self.ppadCY + 1):
-          self.drawPktLine(pkt, self.cap.packets[pkt].out(), False, True)
+          self.drawPkt(self.mark - 1) 
+        for pkt in xrange(max(self.mark, self.winTop), min(self.ppadCY + 1, self.winTop + self.winRows)):
+          self.drawPkt(pkt, False, True)
         if(self.ppadCY < len(self.cap.packets) - 1):
-            self.drawPktLine(self.ppadCY + 1, self.cap.packets[self.ppadCY + 1].out())
+            self.drawPkt(self.ppadCY + 1)
 
     else:
-      self.drawPktLine(self.ppadCY, self.cap.packets[self.ppadCY].out(), True)
+      self.drawPkt(self.ppadCY, True)
 
       if(self.ppadCY == 0): # First packet in ppad
         if(len(self.cap.packets) > 1):
-          self.drawPktLine(1, self.cap.packets[1].out())
+          self.drawPkt(1)
         
       elif(self.cY == self.ppadTopY - 1): # Top packet on screen
-        self.drawPktLine(self.ppadCY + 1, self.cap.packets[self.ppadCY + 1].out())
+        self.drawPkt(self.ppadCY + 1)
 
       elif((self.cY == self.ppadBottomY - 1) or (len(self.cap.packets) == self.ppadCY + 1)): # Bottom packet on screen
-        self.drawPktLine(self.ppadCY - 1, self.cap.packets[self.ppadCY - 1].out())
+        self.drawPkt(self.ppadCY - 1)
 
       else: # Middle packet on screen
-        self.drawPktLine(self.ppadCY - 1, self.cap.packets[self.ppadCY - 1].out())
-        self.drawPktLine(self.ppadCY + 1, self.cap.packets[self.ppadCY + 1].out())
+        self.drawPkt(self.ppadCY - 1)
+        self.drawPkt(self.ppadCY + 1)
 
-  # Draws a packet line onto our ppad
-  # Takes a y value and list of cells that correlates to our global header list
-  # cfg.dbg("drawPktLine y:" + str(y) + " pid:" + str(row['pid']['pid']) + " bold:" + str(bold) + " rev:" + str(reverse))
-  def drawPktLine(self, y, row, bold=False, reverse=False):
+  # Renders a packet line into a list of [x, text, highlight] segments
+  # Cells of sections present in row are highlighted, filler is not
+  # Takes list of cells that correlates to our global header list
+  def lineSegments(self, row):
+    rv = []
     x = 0
     for s in self.sections:
       if(s.visible):
         if(s.exposed):
           if(s.ID in row):
+            txt = ''
             for colName, width in s.c.iteritems():
-              if(reverse):
-                self.ppadAddStr(y, x, row[s.ID][colName].rjust(width) + "|", curses.A_REVERSE)
-              else:
-                if(bold):
-                  self.ppadAddStr(y, x, row[s.ID][colName].rjust(width) + "|", curses.A_BOLD)
-                else:
-                  self.ppadAddStr(y, x, row[s.ID][colName].rjust(width) + "|")
-              x += width + 1
+              cell = row[s.ID][colName].rjust(width) + "|"
+              if(len(cell) > width + 1): # Overlong values are clipped by the next cell
+                cell = cell[:width + 1]
+              txt += cell
+            rv.append([x, txt, True])
 
           else:
-            self.ppadHLine(y, x, " ", s.width - 1)
-            self.ppadAddStr(y, x + s.width - 1, "|")
-            x += s.width
+            rv.append([x, " " * (s.width - 1) + "|", False])
         else:
-          self.ppadHLine(y, x, "-", s.width - 1)
-          self.ppadAddStr(y, x + s.width - 1, "|")
-          x += s.width
+          rv.append([x, "-" * (s.width - 1) + "|", False])
+        x += s.width
+    return rv
+
+  # Draws rendered segments of a packet line onto our ppad
+  # y is a zero based packet index and is translated to our ppad window here
+  # cfg.dbg("drawSegments y:" + str(y) + " bold:" + str(bold) + " rev:" + str(reverse))
+  def drawSegments(self, y, segs, bold=False, reverse=False):
+    y -= self.winTop
+    if(reverse):
+      atr = curses.A_REVERSE
+    elif(bold):
+      atr = curses.A_BOLD
+    else:
+      atr = None
+
+    for x, txt, highlight in segs:
+      if(highlight):
+        self.ppadAddStr(y, x, txt, atr)
       else:
-        continue
+        self.ppadAddStr(y, x, txt)
 
   # Draws our top 2 header rows
   def drawHeader(self):
@@ -414,8 +484,12 @@ class HexScreen:
         continue
         
   # Draws our footer
+  # An empty capture has no sections, so it has no cursor column to show
   def drawFooter(self):
-    s,c = self.cursorColumn(self.cX)
+    if(len(self.cap.packets) == 0):
+      s = c = None
+    else:
+      s,c = self.cursorColumn(self.cX)
     y = self.maxY - self.footerHeight
     x = 0
     divider = 2
@@ -439,20 +513,21 @@ class HexScreen:
       txt = "NAV"
     x += addElement(txt)
 
-    if(s.exposed):
-      if(s.RO):
-        txt = s.ID + "/" + c + "/RO"
+    if(s):
+      if(s.exposed):
+        if(s.RO):
+          txt = s.ID + "/" + c + "/RO"
+        else:
+          txt = s.ID + "/" + c + "/RW"
       else:
-        txt = s.ID + "/" + c + "/RW"
-    else:
-      txt = s.ID + "/-/-"
-    x += addElement(txt)
+        txt = s.ID + "/-/-"
+      x += addElement(txt)
 
     if(self.cap.ifName):
       x += addElement(self.cap.ifName)
 
     # Show control elements if present
-    if(self.cap.packets[self.ppadCY].control):
+    if(s and self.cap.packets[self.ppadCY].control):
       if(self.cap.packets[self.ppadCY].control == 'g'):
         for lay in self.cap.packets[self.ppadCY].genLayers:
           if(lay.ID == s.ID):
@@ -473,7 +548,7 @@ class HexScreen:
     if(self.ppadBottomY >= self.ppadRows):
       return
 
-    self.drawPktLine(self.ppadCY, self.cap.packets[self.ppadCY].out())
+    self.drawPkt(self.ppadCY)
     if(dY > 0):
       ppadHeight = self.ppadBottomY - self.ppadTopY
       if(self.ppadCurY + ppadHeight < self.ppadRows):
@@ -581,22 +656,20 @@ class HexScreen:
   def move(self, dY, dX):
     #    cfg.dbg("move cX:" + str(self.cX) + " dY:" + str(dY) + " dX:" + str(dX) + " ppadCurX:" + str(self.ppadCurX))
 
-    # Finds the next valid X position for cursor
+    # Finds the distance to the next valid X position for cursor in direction of diffX
     # Returns False if no such position exists
     def findValidX(diffX):
-      if((self.ppadCX + diffX >= self.ppadWidth - 1) or (self.ppadCX + diffX < self.offLimitsWidth)):
+      stops = self.lineStops(self.ppadCY)
+      if(diffX > 0):
+        ii = bisect.bisect_right(stops, self.ppadCX)
+      else:
+        ii = bisect.bisect_left(stops, self.ppadCX) - 1
+      if(ii < 0 or ii >= len(stops)):
+        return False
+      elif((stops[ii] >= self.ppadWidth - 1) or (stops[ii] < self.offLimitsWidth)):
         return False
       else:
-        validChars = copy.deepcopy(cfg.hexChars)
-        validChars.append(ord('-')) # For hidden sections
-        validChars.append(ord('.')) # For the undefined layer
-        if(ord(self.inch(self.ppadCY, self.ppadCX + diffX)[1]) in validChars):
-          return diffX
-        else:
-          if(diffX > 0):
-            return findValidX(diffX + 1)
-          else:
-            return findValidX(diffX - 1)
+        return stops[ii] - self.ppadCX
 
     if(dY == 0 and dX == 0):
       return
@@ -719,13 +792,6 @@ class HexScreen:
   def getch(self):
     return self.stdscr.getch()
 
-  # Takes ppad relative y,x coordinates
-  # Returns list((int)attributes, (chr)character) at that location on our ppad
-  def inch(self, y, x):
-    # curses.inch() returns 3 bytes; left byte is attributes, right 2 bytes are the character
-    inpt = hex(self.ppad.inch(y, x))[2:].zfill(6) 
-    return list((int(inpt[:2], 16), chr(int(inpt[2:], 16))))
-
   # Executes passed string in try/except
   # Properly exits if exception raised
   def genericTry(self, s):
@@ -738,6 +804,16 @@ class HexScreen:
       curses.endwin()
       raise
 
+  # Calls passed function with passed args in try/except
+  # Properly exits if exception raised
+  def cursesTry(self, f, *args):
+    try:
+      return f(*args)
+    except:
+      curses.echo()
+      curses.endwin()
+      raise
+
   # Transmits packets by calling capture.tx()
   # Handles blocking/unblocking and keyboard Interrupt from user
   # If repeat is zero then loop until broken by user
@@ -750,6 +826,7 @@ class HexScreen:
         self.printToMBuf(str(pktSent) + " packets egressed " + self.cap.ifName)
 
     # Does the actual sending, returns on user input
+    # Takes a list of [pid, packet] pairs
     # Returns tuple [successes, failure, userBreak]
     # successes is packets sent successfully
     # failure is True if any packet failed to send, otherwise false
@@ -759,7 +836,7 @@ class HexScreen:
       failure = False
       userBreak = False
 
-      for pkt in packets:
+      for pid, pkt in packets:
         if(pkt.control == 's'): # Sleep
           for halfSecond in xrange(2 * int(pkt.layer('cntrl').vals['arg'].strip())):
             sleep(0.5)
@@ -768,7 +845,7 @@ class HexScreen:
 
         elif(pkt.control == 'j'): # Jump
           jmpPid = int(pkt.layer('cntrl').vals['arg'].strip())
-          newPackets = [p for p in packets if(int(p.getPID()) >= jmpPid)]
+          newPackets = [pp for pp in packets if(pp[0] >= jmpPid)]
           ss,ff,ub = sendPkts(newPackets)
           successes += ss
           failure |= ff
@@ -803,7 +880,7 @@ class HexScreen:
       if(last > len(self.cap.packets) - 1):
         last =  len(self.cap.packets) - 1
       for jj in xrange(first, last+1):
-        pkts.append(self.cap.packets[jj])
+        pkts.append([jj + 1, self.cap.packets[jj]])
 
     else: # User wants reverse ordering
       if(last < 0):
@@ -811,15 +888,16 @@ class HexScreen:
       if(first > len(self.cap.packets) - 1):
         first =  len(self.cap.packets) - 1
       for jj in xrange(first, last-1, -1):
-        pkts.append(self.cap.packets[jj])
+        pkts.append([jj + 1, self.cap.packets[jj]])
 
     # Check for illegal jumps before starting
-    for pkt in pkts:
+    # Our pids are positions in the capture at the time of transmission
+    for pid, pkt in pkts:
       if(pkt.control == 'j'):
-        jmpPid = pkt.layer('cntrl').vals['arg'].strip()
-        if(jmpPid < pkt.getPID()):
+        jmpPid = int(pkt.layer('cntrl').vals['arg'].strip())
+        if(jmpPid < pid):
           return "Error_Internal: Cannot jump backwards"
-        if(jmpPid not in [p.getPID().lstrip("0") for p in pkts]):
+        if(jmpPid not in [pp[0] for pp in pkts]):
           return "Error: Cannot jump outside of tx range"
 
     self.printToMBuf("Any key to break")
@@ -905,6 +983,7 @@ class HexScreen:
   # Takes a command string and variable list of args
   def modPkt(self, f, *args):
     def redraw(): # Redraws screen after modifying column
+      self.cap.retrack(self.cap.packets[self.ppadCY])
       self.buildSections()
       self.resetCursor()
       self.drawPpads()
@@ -1003,30 +1082,30 @@ class HexScreen:
   # Wrapper for ppad.addstr
   def ppadAddStr(self, y, x, s, atr=None):
     if(atr):
-      self.genericTry("self.ppad.addstr(" + str(y) + "," + str(x) + ",'" + s + "'," + str(atr) + ")")
+      self.cursesTry(self.ppad.addstr, y, x, s, atr)
     else:
-      self.genericTry("self.ppad.addstr(" + str(y) + "," + str(x) + ",'" + s + "')")
+      self.cursesTry(self.ppad.addstr, y, x, s)
 
   # Wrapper for ppad.hline
   def ppadHLine(self, y, x, char, width, atr=None):
     if(atr):
-      self.genericTry("self.ppad.hline(" + str(y) + "," + str(x) + ",'" + char + "'," + str(width) + "," + str(atr) + ")")
+      self.cursesTry(self.ppad.hline, y, x, char, width, atr)
     else:
-      self.genericTry("self.ppad.hline(" + str(y) + "," + str(x) + ",'" + char + "'," + str(width) + ")")
+      self.cursesTry(self.ppad.hline, y, x, char, width)
 
   # Wrapper for header ppad.addstr
   def headPpadAddStr(self, y, x, s, atr=None):
     if(atr):
-      self.genericTry("self.headPpad.addstr(" + str(y) + "," + str(x) + ",'" + s + "'," + str(atr) + ")")
+      self.cursesTry(self.headPpad.addstr, y, x, s, atr)
     else:
-      self.genericTry("self.headPpad.addstr(" + str(y) + "," + str(x) + ",'" + s + "')")
+      self.cursesTry(self.headPpad.addstr, y, x, s)
 
   # Wrapper for ppad.hline
   def headPpadHLine(self, y, x, char, width, atr=None):
     if(atr):
-      self.genericTry("self.headPpad.hline(" + str(y) + "," + str(x) + ",'" + char + "'," + str(width) + "," + str(atr) + ")")
+      self.cursesTry(self.headPpad.hline, y, x, char, width, atr)
     else:
-      self.genericTry("self.headPpad.hline(" + str(y) + "," + str(x) + ",'" + char + "'," + str(width) + ",)")
+      self.cursesTry(self.headPpad.hline, y, x, char, width)
 
   # Handles our character insertion
   # Modifies column then increments cursor X position by 1
@@ -1039,21 +1118,14 @@ class HexScreen:
     elif(not self.cap.packets[self.ppadCY].hasLayer(sect.ID)): # Cursor section not in packet
       return
 
-    attr,char = self.inch(self.ppadCY, self.ppadCX)
-    if(ord(char) not in cfg.hexChars): # Cursor character is immutable
+    txt = self.lineText(self.ppadCY)
+    if((self.ppadCX >= len(txt)) or (ord(txt[self.ppadCX]) not in cfg.hexChars)): # Cursor character is immutable
       self.move(0, 1)
       return
 
-    leftX = self.columnLeft(sect.ID, col)
-    rightX = self.columnRight(sect.ID, col)
-
-    val = ""
-    for x in xrange(leftX, rightX + 1):
-      if(x == self.cX):
-        val += chr(c)
-      else:
-        attr,char = self.inch(self.ppadCY, self.ppadCurX + x)
-        val += char
+    leftX = self.ppadCurX + self.columnLeft(sect.ID, col)
+    rightX = self.ppadCurX + self.columnRight(sect.ID, col)
+    val = txt[leftX:self.ppadCX] + chr(c) + txt[self.ppadCX + 1:rightX + 1]
 
     self.cap.packets[self.ppadCY].setColumn(sect.ID, col, val)
     self.move(0, 1)
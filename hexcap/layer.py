@@ -6,20 +6,148 @@ All rights reserved.
 '''
 
 # For now we just let dpkt do all the checksum calculations
-# So it's not possible to create packets with invalid checksums
-# AND any packets opened with invalid checksums will have them corrected at save time
+# So it's not possible to create edited packets with invalid checksums
+# Only edited packets are packed again by dpkt and have their checksums recalculated at save time
+# Packets never edited are written out exactly as read, including any invalid checksums they had
 
 import cfg
+import counter
+import hexcodec
 import sys
 sys.path.insert(0, sys.path[0] + '/../dpkt/')
 import dpkt
 from collections import OrderedDict
 import math
+import copy
+
+# String values at most this long are interned, they repeat across packets
+internLen = 8
+
+# Marks fields of a Vals that have not been set
+unset = object()
+
+# Generators of every layer without any of its own, MUST never be written to, see Layer.ownGen()
+noGen = {}
+
+# Field name to list index for each layer class, see schema()
+schemas = {}
+
+# Returns the schema of passed layer class as a dict of field name to list index
+# Every column is a field, followed by the hidden fields of the class
+def schema(cls):
+  try:
+    return schemas[cls]
+  except KeyError:
+    names = list(cls.cols)
+    for name in cls.hidden:
+      if(not name in cls.cols):
+        names.append(name)
+    schemas[cls] = dict([(names[ii], ii) for ii in xrange(len(names))])
+    return schemas[cls]
+
+# Holds the values of a single layer and is used like a dict
+# Values of schema fields live in a list, anything else in a dict only created when needed
+class Vals(object):
+  __slots__ = ('schema', 'v', 'more')
+
+  def __init__(self, schema):
+    self.schema = schema
+    self.v = [unset] * len(schema)
+    self.more = None
+
+  def __getitem__(self, key):
+    if(key in self.schema):
+      rv = self.v[self.schema[key]]
+      if(rv is not unset):
+        return rv
+    elif(self.more and key in self.more):
+      return self.more[key]
+    raise KeyError, key
+
+  def __setitem__(self, key, val):
+    if(isinstance(val, str) and len(val) <= internLen):
+      val = intern(val)
+    if(key in self.schema):
+      self.v[self.schema[key]] = val
+    else:
+      if(self.more is None):
+        self.more = {}
+      self.more[key] = val
+
+  def __contains__(self, key):
+    if(key in self.schema):
+      return self.v[self.schema[key]] is not unset
+    return bool(self.more) and key in self.more
+
+  def __len__(self):
+    return len(self.keys())
+
+  def __iter__(self):
+    return iter(self.keys())
+
+  def __eq__(self, other):
+    return dict(self.items()) == dict(other.items())
+
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
+  def __repr__(self):
+    return repr(dict(self.items()))
+
+  def __copy__(self):
+    rv = Vals(self.schema)
+    rv.v = list(self.v)
+    if(self.more):
+      rv.more = dict(self.more)
+    return rv
+
+  def __deepcopy__(self, memo):
+    rv = Vals(self.schema)
+    memo[id(self)] = rv
+    rv.v = [val if val is unset else copy.deepcopy(val, memo) for val in self.v]
+    rv.more = copy.deepcopy(self.more, memo)
+    return rv
+
+  def get(self, key, default=None):
+    if(key in self):
+      return self[key]
+    return default
+
+  def keys(self):
+    return [k for k,v in self.iteritems()]
+
+  def items(self):
+    return list(self.iteritems())
+
+  def iteritems(self):
+    for key, ii in self.schema.iteritems():
+      if(self.v[ii] is not unset):
+        yield key, self.v[ii]
+    if(self.more):
+      for item in self.more.iteritems():
+        yield item
+
+# Names of every slot of each layer class, see slots()
+slotNames = {}
+
+# Returns the names of every slot of passed layer class, its own and those it inherits
+def slots(cls):
+  try:
+    return slotNames[cls]
+  except KeyError:
+    slotNames[cls] = [name for c in cls.__mro__ for name in c.__dict__.get('__slots__', ())]
+    return slotNames[cls]
+
+# Slots keep every layer small, a subclass MUST declare __slots__ or its instances get a dict again
+class Layer(object):
+  __slots__ = ('vals', 'dirty', '_gen')
 
-class Layer:
   # cols holds width in displayed characters for each column, inclusive any delimiters
   cols = OrderedDict()
 
+  # hidden holds names of fields we keep in vals but never display
+  hidden = []
+
   # delim holds lists of columns which require delimiters
   # Format of list is [delimter, field_width]
   delim = {}
@@ -28,9 +156,48 @@ class Layer:
   exposed = True # Is this layer exposed
   exposable = True # Can the exposed boolean be toggled?
 
+  # dpkt classes this class decodes, see decoders
+  decodes = ()
+
   def __init__(self):
-    self.vals = {} # Holds values for each column
-    self.gen = {} # Holds generators for each column
+    self.vals = Vals(schema(self.__class__)) # Holds values for each column
+    self.dirty = False # Has any column or generator changed since we were decoded
+    self._gen = None # Our own generators, see ownGen()
+
+  # Holds generators for each column
+  # Layers without any share noGen
+  def _get_gen(self):
+    if(self._gen is None):
+      return noGen
+    return self._gen
+
+  def _set_gen(self, gen):
+    self._gen = gen
+  gen = property(_get_gen, _set_gen)
+
+  # Returns a copy of this layer for a packet of its own
+  # Column values are immutable so only our vals and any gen of our own are copied
+  # Everything else, including what a layer keeps beside its vals, is shared
+  def clone(self):
+    rv = self.__class__.__new__(self.__class__)
+    for name in slots(self.__class__):
+      setattr(rv, name, getattr(self, name))
+    rv.vals = copy.copy(self.vals)
+    if(self._gen is not None):
+      rv._gen = dict([(col, dict(gDef)) for col, gDef in self._gen.iteritems()])
+    return rv
+
+  # Gives this layer its own gen dict before it is written to
+  def ownGen(self):
+    if(self._gen is None):
+      self._gen = {}
+
+  # Returns our layers for passed dpkt object of a class in decodes, and what to decode next
+  # Decoding stops when what to decode next is not a dpkt object
+  # Returning passed dpkt object as what to decode next leaves it over, see Leftovers
+  @classmethod
+  def decode(cls, d):
+    return [cls(d)], d.data
 
   # Convert int to hex without leading 0x
   def intToHexStr(self, num):
@@ -39,38 +206,16 @@ class Layer:
 
   # Change pcap character data to padded hex string without leading 0x
   def binToHexStr(self, val):
-    return hex(ord(val)).split("0x")[1].rjust(2, "0")
+    return hexcodec.charHex[val]
 
   # Change dpkt character bytes to string hex values of length ln with a delimiter of delim
   # ln corresponds to how many nibbles you want between each delim
   def pcapToHexStr(self, bytes, delim, ln=2):
-    rv = ""
-    trv = ""
-    for b in bytes:
-      trv += self.binToHexStr(b)
-      if(len(trv) >= ln):
-        rv += trv + delim
-        trv = ""
-    return rv.rstrip(delim)
+    return hexcodec.toHex(bytes, delim, ln)
 
   # Change string hex values to dpkt character bytes ignoring delimiter of delim
   def hexStrToPcap(self, s, delim, ln=2):
-    rv = ""
-    bytes = s.split(delim)
-
-    if(ln != 2):
-      if((ln % 2 != 0) or (ln < 2)):
-        return False
-      else:
-        newbytes = []
-        for b in bytes:
-           for ii in xrange(0, ln, 2):
-            newbytes.append(b[ii:ii+2])
-        bytes = newbytes
-
-    for b in bytes:
-      rv += chr(int(b, 16))
-    return rv
+    return hexcodec.fromHex(s, delim, ln)
 
   # Delimites passed string s with delimiter delim with ln characters between each delim
   # May also pass a prepending string rv
@@ -92,6 +237,8 @@ class Layer:
   # Adds a generator to a col
   # Takes column to add it to; then count and step for the generator
   def addGenerator(self, col, count, step):
+    self.ownGen()
+    self.dirty = True
     if(not col in self.gen):
       self.gen[col] = {'count': count, 'step': step, 'mask': self.delimCol(''.join('0' * (len(cfg.cleanHexStr(self.vals[col])))), col)}
     else:
@@ -112,6 +259,8 @@ class Layer:
         mask = mask.ljust(colLen, '1')
 
     mask = self.delimCol(cfg.binStrToHexStr(mask), col)
+    self.ownGen()
+    self.dirty = True
     if(not col in self.gen):
       self.gen[col] = {'count': 0, 'step': 0, 'mask': mask}
     else:
@@ -120,11 +269,13 @@ class Layer:
   # Sets column to val
   def setColumn(self, col, val):
     self.vals[col] = val
+    self.dirty = True
 
   # Increment passed column by x respecting any set mask
   # x can be any positive or negative integer
   def incColumn(self, col, x):
-    self.vals[col] = cfg.incHexStr(self.vals[col], self.gen[col]['mask'], x)
+    self.vals[col] = counter.Counter(self.vals[col], self.gen[col]['mask']).count(x)
+    self.dirty = True
 
   # A layer must override this once it becomes RWable
   def toPcap(self):
@@ -137,8 +288,10 @@ class Layer:
   def __str__(self):
     return self.__repr__()
 
-# Holds the packet ID and nothing more
+# Describes the packet ID column
+# Never instantiated, packets keep their pid natively and we only format it
 class PktID(Layer):
+  __slots__ = ()
   ID = "pid"
   RO = True
   exposable = False
@@ -147,18 +300,14 @@ class PktID(Layer):
   cols = OrderedDict() 
   cols['pid'] = cfg.pktIDWidth
 
-  def __init__(self, pid):
-    Layer.__init__(self)
-    self.vals['pid'] = str(pid).rjust(cfg.pktIDWidth, "0")
-
-  # Overriding virtual since we're picky about pid
-  def setColumn(self, col, val):
-    if(val == -1): # Fill PID with ?'s if we get passed -1
-      self.vals[col] = ''
-      for ii in xrange(0, cfg.pktIDWidth):
-        self.vals[col] += "?"
+  # Returns passed pid formatted for display
+  # A pid of -1 is shown as ?'s
+  @staticmethod
+  def fmt(pid):
+    if(pid == -1):
+      return "?" * cfg.pktIDWidth
     else:
-      self.vals[col] = str(val).rjust(cfg.pktIDWidth, "0")
+      return str(pid).rjust(cfg.pktIDWidth, "0")
 
 # Generic/Container class for control syntax elements
 # The Control layer holds the type of the syntax element contained within the packet
@@ -166,6 +315,7 @@ class PktID(Layer):
 # If a packet has any generator, sleep or jump; it MUST have a Control layer
 # The value of column 'c' MUST be either 'g', 's', or 'j'
 class Control(Layer):
+  __slots__ = ()
   ID = "cntrl"
   RO = True
   position = 1 # If this layer exists it MUST be in position 1, we assume this in many places
@@ -179,24 +329,27 @@ class Control(Layer):
     self.vals['c'] = format(t, '^' + str(self.cols['c']))
     self.vals['arg'] = format(str(arg), '^' + str(self.cols['arg']))  
 
-# Timestamp layer
+# Describes the timestamp column
+# Never instantiated, packets keep their timestamp natively and we only format it
 class TStamp(Layer):
+  __slots__ = ()
   ID = "tstamp"
   RO = True
   position = 5
 
   cols = OrderedDict() 
   cols['tstamp'] = 13
-    
-  def __init__(self, ts):
-    Layer.__init__(self)
-    self.vals['tstamp'] = "{:.2f}".format(ts)
 
-  def toPcap(self):
-    return float(self.vals['tstamp'])
+  # Returns passed float timestamp formatted for display
+  @staticmethod
+  def fmt(ts):
+    return "{:.2f}".format(ts)
 
 # A layer to hold our unsupported protocol components
+# Our bytes are kept as a view into the frame we were decoded from, nothing is copied
+# Only what fits in our column is ever turned into hex
 class Leftovers(Layer):
+  __slots__ = ('dCls', 'length', 'frame', 'off')
   ID = "Undefined"
   RO = True # For now, undefined layers are Read-Only
   position = 99
@@ -206,24 +359,49 @@ class Leftovers(Layer):
   cols = OrderedDict() 
   cols['undefined'] = uWidth
 
-  def __init__(self, data):
+  # Takes the dpkt object we hold, and the frame it was decoded from with its offset in that frame
+  # Without a frame, or if it is not found at off, we are packed into a frame of our own
+  def __init__(self, data, frame=None, off=0):
     Layer.__init__(self)
-    self.data = data # We store the actual data here
-
-    s = self.pcapToHexStr(data.pack(), ":", len(data.pack()))
-    if(s > self.uWidth):
-      s = s[:self.uWidth - self.dotWidth]
-      for ii in xrange(self.dotWidth):
-        s += "."
-      self.vals['undefined'] = s
+    self.dCls = data.__class__ # Decodes our bytes again when our packet is packed
+    self.length = len(data)
+    if(frame is None or not self.found(data, frame, off)):
+      frame = data.pack()
+      off = 0
+      self.length = len(frame)
+    self.frame = memoryview(frame)
+    self.off = off
+    self.vals['undefined'] = self.render()
+
+  # Is passed dpkt object at off in passed frame
+  # Only its header is packed to compare
+  @staticmethod
+  def found(data, frame, off):
+    if(off + len(data) > len(frame)):
+      return False
+    try:
+      hdr = data.pack_hdr()
+    except dpkt.Error:
+      return False
+    return frame[off:off + len(hdr)] == hdr
+
+  # Returns what we display
+  # All our bytes in hex are split in two groups of half our length, only the start of the first group shows
+  # Once that group is as wide as our column only the bytes shown are turned into hex
+  def render(self):
+    width = self.uWidth - self.dotWidth
+    if(((self.length + 1) // 2) * 2 >= width):
+      s = self.pcapToHexStr(self.frame[self.off:self.off + (width + 1) // 2].tobytes(), "")
     else:
-      self.vals['undefined'] = s.ljust(self.uWidth, "x")
+      s = self.pcapToHexStr(self.frame[self.off:self.off + self.length].tobytes(), ":", self.length)
+    return s[:width] + "." * self.dotWidth
 
   def toPcap(self):
-    return self.data
+    return self.dCls(self.frame[self.off:self.off + self.length].tobytes())
 
 # Our generic ethernet class
 class Ethernet(Layer):
+  __slots__ = ()
   position = 10
 
   cols = OrderedDict() 
@@ -234,11 +412,31 @@ class Ethernet(Layer):
   delim['dst'] = [':', 2]
   delim['src'] = [':', 2]
 
+  decodes = (dpkt.ethernet.Ethernet,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['dst'] = self.pcapToHexStr(data.dst, ":")
     self.vals['src'] = self.pcapToHexStr(data.src, ":")
 
+  # Any 802.1q tags come first, then either Ethernet II or 802.3
+  @classmethod
+  def decode(cls, d):
+    rv = []
+    if(hasattr(d, 'vlan_tags')):
+      if(isinstance(d.vlan_tags[0], dpkt.ethernet.VLANtagISL)):
+        return [], d
+      for tag in d.vlan_tags:
+        rv.append(Dot1q(tag))
+
+    if(d.type > 1500):
+      rv.append(EthernetII(d))
+    elif(d.type == dpkt.ethernet.ETH_TYPE_IPX):
+      return rv, d
+    else:
+      rv.append(EthernetDot3(d))
+    return rv, d.data
+
   def toPcap(self):
     rv = dpkt.ethernet.Ethernet()
     rv.dst = self.hexStrToPcap(self.vals['dst'], ":")
@@ -248,6 +446,7 @@ class Ethernet(Layer):
 
 # IEEE 802.3 Ethernet II
 class EthernetII(Ethernet):
+  __slots__ = ()
   ID = "ethernet II"
 
   cols = OrderedDict() 
@@ -267,6 +466,7 @@ class EthernetII(Ethernet):
 
 # IEEE 802.3 ethernet frame
 class EthernetDot3(Ethernet):
+  __slots__ = ()
   ID = "ethernet 802.3"
 
   cols = OrderedDict()
@@ -286,6 +486,7 @@ class EthernetDot3(Ethernet):
 
 # Logical Link Control
 class LLC(Layer):
+  __slots__ = ()
   ID = "LLC"
   position = 20
 
@@ -295,6 +496,8 @@ class LLC(Layer):
   cols['ctl'] = 3
   cols['oui'] = 6
 
+  decodes = (dpkt.llc.LLC,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['dsap'] = self.intToHexStr(data.dsap).rjust(2, "0")
@@ -314,6 +517,7 @@ class LLC(Layer):
 # IEEE 802.11 WLAN
 # Very basic
 class Dot11(Layer):
+  __slots__ = ()
   ID = "802.11"
   position = 10
 
@@ -325,6 +529,10 @@ class Dot11(Layer):
   cols['from'] = 4
   cols['wep'] = 4
 
+  hidden = ['more_frag', 'retry', 'pwr', 'more_data', 'order'] # Fields we keep but never display
+
+  decodes = (dpkt.ieee80211.IEEE80211,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['ver'] = self.intToHexStr(data.version)
@@ -356,6 +564,7 @@ class Dot11(Layer):
 
 # IEEE 802.1q
 class Dot1q(Layer):
+  __slots__ = ()
   ID = "802.1q"
   position = 20
 
@@ -364,6 +573,8 @@ class Dot1q(Layer):
   cols['pri'] = 5
   cols['etype'] = 5
 
+  hidden = ['cfi'] # Fields we keep but never display
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['tag'] = self.intToHexStr(data.id).rjust(4, "0")
@@ -383,11 +594,13 @@ class Dot1q(Layer):
     if(col == '1p'):
       if(0 <= int(val, 16) <= 7):
         self.vals[col] = val
+        self.dirty = True
     else:
       Layer.setColumn(self, col, val)
 
 # Cisco Discovery Protocol
 class CDP(Layer):
+  __slots__ = ()
   ID = "cdp"
   position = 20
 
@@ -395,12 +608,21 @@ class CDP(Layer):
   cols['ver'] = 3
   cols['ttl'] = 3
 
+  hidden = ['data'] # Fields we keep but never display
+
+  decodes = (dpkt.cdp.CDP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['ver'] = self.intToHexStr(data.version).rjust(2, "0")
     self.vals['ttl'] = self.intToHexStr(data.ttl).rjust(2, "0")
     self.vals['data'] = data.data
 
+  # Our TLVs are kept whole in our data
+  @classmethod
+  def decode(cls, d):
+    return [cls(d)], None
+
   def toPcap(self):
     rv = dpkt.cdp.CDP()
     rv.version = int(self.vals['ver'], 16)
@@ -410,6 +632,7 @@ class CDP(Layer):
 
 # Extreme Discovery Protocol
 class EDP(Layer):
+  __slots__ = ()
   ID = "edp"
   position = 20
 
@@ -422,6 +645,10 @@ class EDP(Layer):
   cols['seq'] = 4
   cols['mac'] = 17
 
+  hidden = ['res', 'mid', 'data'] # Fields we keep but never display
+
+  decodes = (dpkt.edp.EDP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['ver'] = self.intToHexStr(data.version).rjust(2, "0")
@@ -432,6 +659,11 @@ class EDP(Layer):
     self.vals['mid'] = data.mid
     self.vals['data'] = data.data
 
+  # Our TLVs are kept whole in our data
+  @classmethod
+  def decode(cls, d):
+    return [cls(d)], None
+
   def toPcap(self):
     rv = dpkt.edp.EDP()
     rv.version = int(self.vals['ver'], 16)
@@ -445,6 +677,7 @@ class EDP(Layer):
 
 # Spanning Tree Protocol
 class STP(Layer):
+  __slots__ = ()
   ID = "stp"
   position = 30
 
@@ -462,6 +695,10 @@ class STP(Layer):
   delim['root'] = [':', 2]
   delim['bridge'] = [':', 2]
 
+  hidden = ['proto-id', 'ver', 'type', 'flags', 'data'] # Fields we keep but never display
+
+  decodes = (dpkt.stp.STP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['root'] = self.pcapToHexStr(data.root_id, ":")
@@ -500,6 +737,7 @@ class STP(Layer):
 # HTYPE == 1(Ethernet)
 # PTYPE == 0x0800(IPv4)
 class ARP(Layer):
+  __slots__ = ()
   ID = "iparp"
   position = 35
 
@@ -514,6 +752,8 @@ class ARP(Layer):
   delim['sha'] = [':', 2]
   delim['tha'] = [':', 2]
 
+  decodes = (dpkt.arp.ARP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['oper'] = self.intToHexStr(data.op).rjust(4, "0")
@@ -533,6 +773,7 @@ class ARP(Layer):
 
 # Internet Protocol version 4
 class IPv4(Layer):
+  __slots__ = ()
   ID = "ipv4"
   position = 40
 
@@ -548,6 +789,10 @@ class IPv4(Layer):
   delim['dst'] = ['.', 2]
   delim['src'] = ['.', 2]
 
+  hidden = ['off', 'hl', 'v', 'len', 'id', 'opts'] # Fields we keep but never display
+
+  decodes = (dpkt.ip.IP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['dst'] = self.pcapToHexStr(data.dst, ".")
@@ -586,11 +831,13 @@ class IPv4(Layer):
     if(col == 'df'):
       if(0 <= int(val, 16) <= 7):
         self.vals[col] = val
+        self.dirty = True
     else:
       Layer.setColumn(self, col, val)
 
 # Internet Protocol Version 6
 class IPv6(Layer):
+  __slots__ = ()
   ID = "ipv6"
   position = 40
   
@@ -606,6 +853,10 @@ class IPv6(Layer):
   delim['dst'] = [':', 4]
   delim['src'] = [':', 4]
 
+  hidden = ['v', 'len'] # Fields we keep but never display
+
+  decodes = (dpkt.ip6.IP6,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['dst'] = self.pcapToHexStr(data.dst, ":", 4)
@@ -637,6 +888,7 @@ class IPv6(Layer):
 # Internet Group Management Protocol v1/v2
 # We do not currently support v3
 class IGMP(Layer):
+  __slots__ = ()
   ID = "igmp"
   position = 50
 
@@ -648,12 +900,21 @@ class IGMP(Layer):
   delim = {}
   delim['group'] = ['.', 2]
 
+  decodes = (dpkt.igmp.IGMP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['type'] = self.intToHexStr(data.type).rjust(2, "0")
     self.vals['maxresp'] = self.intToHexStr(data.maxresp).rjust(2, "0")
     self.vals['group'] = self.pcapToHexStr(data.group, ".")
 
+  # IGMPv3 reports are left over
+  @classmethod
+  def decode(cls, d):
+    if(d.type == 0x22):
+      return [], d
+    return [cls(d)], d.data
+
   def toPcap(self):
     rv = dpkt.igmp.IGMP()
     rv.type = int(self.vals['type'], 16)
@@ -664,6 +925,7 @@ class IGMP(Layer):
 # Internet Control Message Protocol
 # Assumes ICMP type is either 0 or 8(echo or echo_reply)
 class ICMP(Layer):
+  __slots__ = ()
   ID = "icmp"
   position = 50
 
@@ -672,6 +934,10 @@ class ICMP(Layer):
   cols['id'] = 4
   cols['seq'] = 3
 
+  hidden = ['data'] # Fields we keep but never display
+
+  decodes = (dpkt.icmp.ICMP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['type'] = self.intToHexStr(data.type)
@@ -679,6 +945,11 @@ class ICMP(Layer):
     self.vals['seq'] = self.intToHexStr(data.data.seq)
     self.vals['data'] = data.data.data
 
+  # Our echo is part of us
+  @classmethod
+  def decode(cls, d):
+    return [cls(d)], None
+
   def toPcap(self):
     rv = dpkt.icmp.ICMP()
     rv.data = dpkt.icmp.ICMP.Echo()
@@ -690,6 +961,7 @@ class ICMP(Layer):
 
 # User Datagram Protocol
 class UDP(Layer):
+  __slots__ = ()
   ID = "udp"
   position = 50  
 
@@ -698,6 +970,10 @@ class UDP(Layer):
   cols['sport'] = 5
   cols['ulen'] = 4
 
+  hidden = ['data'] # Fields we keep but never display
+
+  decodes = (dpkt.udp.UDP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['dport'] = self.intToHexStr(data.dport)
@@ -715,6 +991,7 @@ class UDP(Layer):
 
 # Transport Control Protocol
 class TCP(Layer):
+  __slots__ = ()
   ID = "tcp"
   position = 50
 
@@ -725,6 +1002,10 @@ class TCP(Layer):
   cols['ack'] = 8
   cols['win'] = 4
 
+  hidden = ['flags', 'data', 'off', 'opts'] # Fields we keep but never display
+
+  decodes = (dpkt.tcp.TCP,)
+
   def __init__(self, data):
     Layer.__init__(self)
     self.vals['dport'] = self.intToHexStr(data.dport)
@@ -757,19 +1038,38 @@ class TCP(Layer):
     rv.off = self.vals['off']
     return rv
 
+# Layer classes by the dpkt class they decode
+# Filled from the decodes attribute every layer class above sets for itself
+# A new protocol only needs a layer class with decodes set, see Packet.initLayers()
+decoders = {}
+for obj in globals().values():
+  if(isinstance(obj, type(Layer)) and issubclass(obj, Layer)):
+    for dCls in obj.__dict__.get('decodes', ()):
+      decoders[dCls] = obj
+
+# Returns the layer class decoding passed dpkt object, or None if we have none
+def decoder(d):
+  try:
+    return decoders[d.__class__]
+  except KeyError: # Subclasses of what we decode are decoded like it
+    for dCls in d.__class__.__mro__:
+      if(dCls in decoders):
+        decoders[d.__class__] = decoders[dCls]
+        return decoders[dCls]
+    decoders[d.__class__] = None
+    return None
+
 # These tests are horribly outdated and unmaintained
 # Run through some tests for our Layers
 # Takes a capture file
 def test(cap):
 
   # PktID
-  d = PktID(1)
-  if(not d.toPcap()):
-    print d.vals['pid']
+  print PktID.fmt(1)
+  print PktID.fmt(-1)
   
   # TStamp
-  d = TStamp(1986187623.12)
-  print repr(d.toPcap())
+  print TStamp.fmt(1986187623.12)
 
   # Ethernet
   l = []
@@ -10,20 +10,35 @@ import sys
 sys.path.insert(0, sys.path[0] + '/../dpkt/')
 import dpkt
 import layer
-
-class Packet:
-  def __init__(self, dlt, ts, packet, pid):
-    self.layers = []
-    self.layers.append(layer.PktID(pid))
-    self.layers.append(layer.TStamp(ts))
-
+import dissect
+
+# Our timestamp is kept natively and only turned into a column by out()
+# We have no pid of our own, it is our one based position in the capture and is passed to out()
+# Slots keep every packet small, __weakref__ is needed for the line cache of HexScreen
+class Packet(object):
+  __slots__ = ('layers', 'ts', 'raw', 'leftovers', 'edited', 'version', 'regLayers', 'minSize', 'maxSize', '__weakref__')
+
+  def __init__(self, dlt, ts, packet):
+    self.layers = [] # Our protocol layers and any Control layer
+    self.ts = ts # Float seconds
+    self.raw = str(packet) # Our original bytes, dropped once we are edited
     self.leftovers = None
+    self.edited = False # Has this packet been modified since it was decoded
+    self.version = 0 # Incremented every time anything we display changes
+    self.regLayers = () # Layer classes our capture has counted for us, see Capture.track()
 
     self.minSize = len(packet)
     self.maxSize = max(dpkt.ethernet.ETH_MTU, len(packet))
 
+    # Common frames are decoded without dpkt, see dissect.py
+    layers = None
+    if(cfg.fastDissect):
+      layers = dissect.dissect(dlt, self.raw)
+
     # http://www.tcpdump.org/linktypes.html
-    if(dlt == 1): # Ethernet
+    if(layers):
+      self.layers = layers
+    elif(dlt == 1): # Ethernet
       self.initLayers(dpkt.ethernet.Ethernet(packet))
     elif(dlt == 105): # IEEE802_11
       self.initLayers(dpkt.ieee80211.IEEE80211(packet))
@@ -40,143 +55,130 @@ class Packet:
     else:
       self.layers.append(lay)
 
+  # Returns a copy of this packet that can be edited without touching us
+  # Our layers are cloned, our original bytes are shared
+  def clone(self):
+    rv = Packet.__new__(Packet)
+    for name in self.__slots__:
+      if(name != '__weakref__'):
+        setattr(rv, name, getattr(self, name))
+    rv.layers = [lay.clone() for lay in self.layers]
+    return rv
+
+  # Returns the classes of our layers as a tuple, including our pid and timestamp columns
+  def layerSig(self):
+    return (layer.PktID, layer.TStamp) + tuple([lay.__class__ for lay in self.layers])
+
   # Is every layer of this packet writable
   # TODO:Add more checks in the future
   def _RW(self):
     for lay in self.layers:
-      if(lay.ID == 'pid' or lay.ID == 'tstamp'):
-        continue
-      elif(not lay.toPcap()):
+      if(not lay.toPcap()):
         if(not self.leftovers):
           return False
     return True
   RW = property(_RW)
 
   # Discover the layers in the packet and construct our layers list
+  # Each dpkt object is decoded by the layer class registered for it, see layer.decoders
   def initLayers(self, d):
-    if(not isinstance(d, dpkt.Packet)):
-      return
-
-    # TODO: There has to be a better way to do this, but right now this must suffice
-    if(isinstance(d, dpkt.ethernet.Ethernet)):
-      if hasattr(d, 'vlan_tags'):
-        if isinstance(d.vlan_tags[0], dpkt.ethernet.VLANtagISL):
-          self.unsupport(d)
-          return
-        else:
-          for tag in d.vlan_tags:
-            self.layers.append(layer.Dot1q(tag))
-
-      if d.type > 1500:
-        self.layers.append(layer.EthernetII(d)) # Ethernet II
-        self.initLayers(d.data)
-      elif d.type == dpkt.ethernet.ETH_TYPE_IPX: # IPX
-        self.unsupport(d)
+    off = 0 # Where d starts in our original bytes
+    while(isinstance(d, dpkt.Packet)):
+      cls = layer.decoder(d)
+      if(not cls):
+        self.unsupport(d, off)
         return
-      else:
-        self.layers.append(layer.EthernetDot3(d)) # 802.3
-        self.initLayers(d.data)
-
-    elif isinstance(d, dpkt.ieee80211.IEEE80211):
-      self.layers.append(layer.Dot11(d))
-      self.initLayers(d.data)
-
-    elif isinstance(d, dpkt.llc.LLC):
-      self.layers.append(layer.LLC(d))
-      self.initLayers(d.data)
-
-    elif isinstance(d, dpkt.cdp.CDP):
-      self.layers.append(layer.CDP(d))
-      return
-
-    elif isinstance(d, dpkt.edp.EDP):
-      self.layers.append(layer.EDP(d))
-      return
-
-    elif isinstance(d, dpkt.stp.STP):
-      self.layers.append(layer.STP(d))
-      self.initLayers(d.data)
-
-    elif isinstance(d, dpkt.arp.ARP):
-      self.layers.append(layer.ARP(d))
-      self.initLayers(d.data)
-                         
-    elif isinstance(d, dpkt.ip.IP):
-      self.layers.append(layer.IPv4(d))
-      self.initLayers(d.data)
-
-    elif isinstance(d, dpkt.ip6.IP6):
-      self.layers.append(layer.IPv6(d))
-      self.initLayers(d.data)
-
-    elif isinstance(d, dpkt.igmp.IGMP):
-      if(d.type == 0x22): # IGMPv3
-        self.unsupport(d)
-        return
-      else:
-        self.layers.append(layer.IGMP(d))
-        self.initLayers(d.data)
-
-    elif isinstance(d, dpkt.icmp.ICMP):
-      self.layers.append(layer.ICMP(d))
-      return
 
-    elif isinstance(d, dpkt.tcp.TCP):
-      self.layers.append(layer.TCP(d))
-      self.initLayers(d.data)
-
-    elif isinstance(d, dpkt.udp.UDP):
-      self.layers.append(layer.UDP(d))
-      self.initLayers(d.data)
-
-    else:
-      self.unsupport(d)
-      return
+      lays, nxt = cls.decode(d)
+      self.layers.extend(lays)
+      if(nxt is d):
+        self.unsupport(d, off)
+        return
+      elif(isinstance(nxt, dpkt.Packet)):
+        off += self.hdrLen(d)
+      d = nxt
+
+  # Returns how many bytes of passed dpkt object come before its data
+  # Ethernet counts a trailing FCS as its own
+  # SHOULD never be called outside of class
+  def hdrLen(self, d):
+    rv = len(d) - len(d.data)
+    if(isinstance(d, dpkt.ethernet.Ethernet) and isinstance(d.data, dpkt.llc.LLC) and hasattr(d, 'fcs')):
+      rv -= len(getattr(d, 'trailer', '')) + 4
+    return rv
 
   # Catchall function for unsupported protocols
   # If we find an unsupported protocol we end up here
   # Just save the leftovers in one generic layer
-  def unsupport(self, d):
-    self.layers.append(layer.Leftovers(d))
+  # Takes the dpkt object we do not decode and where it starts in our original bytes, if known
+  def unsupport(self, d, off=None):
+    if(off is None):
+      self.layers.append(layer.Leftovers(d))
+    else:
+      self.layers.append(layer.Leftovers(d, self.raw, off))
   
+  # Called whenever this packet is modified
+  def modified(self):
+    self.edited = True
+    self.raw = None
+    self.version += 1
+
+  # Has anything we would write out changed since we were decoded
+  # Layers can be edited without going through us, so they are asked too
+  def _get_dirty(self):
+    if(self.edited):
+      return True
+    for lay in self.layers:
+      if(lay.dirty):
+        return True
+    return False
+  dirty = property(_get_dirty)
+
+  # Returns our packet as a string ready for a pcap record or the wire
+  # Clean packets return their original bytes without packing anything
+  def pktStr(self):
+    if(self.raw is not None and not self.dirty):
+      if(self.minSize <= len(self.raw) <= self.maxSize):
+        return self.raw
+    return str(self.data())
+
   # Sets the value of section,column to val
   def setColumn(self, sid, col, val):
     for lay in self.layers:
       if(lay.ID == sid):
         lay.setColumn(col, val)
+        self.modified()
 
   # Transforms a packet into a sleep statement
   def makeSleep(self, seconds):
-    self.layers = self.layers[0:2]
-    self.layers.append(layer.Control('s', seconds))
-    self.layer('tstamp').vals['tstamp'] = ''
+    self.layers = [layer.Control('s', seconds)]
+    self.modified()
 
   # Transforms a packet into a jump statement
   def makeJump(self, jmpPid):
-    self.layers = self.layers[0:2]
-    self.layers.append(layer.Control('j', jmpPid))
-    self.layer('tstamp').vals['tstamp'] = ''
+    self.layers = [layer.Control('j', jmpPid)]
+    self.modified()
 
   # Adds a generator to a layer
   def addGenerator(self, sid, cid, count, step):
     for lay in self.layers:
       if(lay.ID == sid):
+        self.modified()
         rv =  lay.addGenerator(cid, count, step)
         if(rv):
           return rv
         else:
           if(not self.control):
-            self.layer('tstamp').vals['tstamp'] = ''
-            self.layers.insert(1, layer.Control('g'))
+            self.layers.insert(0, layer.Control('g'))
 
   # Adds a mask to a layer
   def addMask(self, sid, cid, mask):
     for lay in self.layers:
       if(lay.ID == sid):
         lay.addMask(cid, mask)
+        self.modified()
         if(not self.control):
-          self.layer('tstamp').vals['tstamp'] = ''
-          self.layers.insert(1, layer.Control('g'))
+          self.layers.insert(0, layer.Control('g'))
         break
 
   # Returns list of all layers with generators
@@ -191,6 +193,26 @@ class Packet:
     return False
   genLayers = property(_get_genLayers)
 
+  # Returns how many packets our generators expand to
+  def _get_genCount(self):
+    rv = 0
+    for lay in self.layers:
+      for col in lay.gen:
+        rv = max(rv, lay.gen[col]['count'])
+    return rv
+  genCount = property(_get_genCount)
+
+  # Returns generated packet ii of this generator packet as a new packet without generators
+  # Columns with only a mask and no count are never incremented
+  def expand(self, ii):
+    rv = self.clone()
+    for lay in rv.layers:
+      for col,gDef in lay.gen.iteritems():
+        if(gDef['count']):
+          lay.incColumn(col, (ii % gDef['count']) * gDef['step'])
+      lay.gen = {}
+    return rv
+
   # Returns the type of control statement this packet is; 'g', 's', OR 'j'
   # If it's a normal packet returns false
   def _get_control(self):
@@ -207,23 +229,18 @@ class Packet:
         return lay
 
   # Convenience method
-  # Returns PID of packet
-  def getPID(self):
-    for lay in self.layers:
-      if(lay.ID == 'pid'):
-        return lay.vals['pid']
-
-  # Convenience method
-  # Returns timestamp of packet
+  # Returns timestamp of packet, control packets have none
   def getTS(self):
-    for lay in self.layers:
-      if(isinstance(TStamp, lay)):
-        return lay.vals['tstamp']
+    if(self.control):
+      return ''
+    return layer.TStamp.fmt(self.ts)
 
   # Convenience method
   # Return True if passed sid corresponds with existing layer in pkt
   # Else returns False
   def hasLayer(self, sid):
+    if(sid == layer.PktID.ID or sid == layer.TStamp.ID):
+      return True
     for lay in self.layers:
       if(lay.ID == sid):
         return True
@@ -234,7 +251,7 @@ class Packet:
   # Returns False if pcap data cannot be constructed
   def data(self):
     for lay in self.layers:
-      if(lay.ID == 'pid' or lay.ID == 'tstamp' or lay.ID == 'cntrl'):
+      if(lay.ID == 'cntrl'):
         continue
       elif(isinstance(lay, layer.Ethernet)):
         rv = lay.toPcap()
@@ -269,7 +286,7 @@ class Packet:
 
   # For debugging only
   def __repr__(self):
-    rv = ''
+    rv = "\ntstamp" + repr(self.getTS())
     for lay in self.layers:
       rv += "\n" + lay.ID + repr(lay)
     return rv
@@ -277,8 +294,12 @@ class Packet:
   def __str__(self):
     return self.__repr__()
 
-  def out(self):
+  # Returns our columns by section ID for display
+  # Takes our one based position in the capture as pid, -1 shows a pid of ?'s
+  def out(self, pid=-1):
     rv = dict()
+    rv[layer.PktID.ID] = {'pid': layer.PktID.fmt(pid)}
+    rv[layer.TStamp.ID] = {'tstamp': self.getTS()}
     for lay in self.layers:
       rv[lay.ID] = lay.vals
     return rv
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+'''Memory mapped pcap file reader with a record index, and a buffered pcap writer'''
+
+import os
+import mmap
+import struct
+from array import array
+
+# hexcap specific imports
+import cfg
+
+# http://wiki.wireshark.org/Development/LibpcapFileFormat
+magicMicro = 0xa1b2c3d4 # Timestamps in microseconds
+magicNano = 0xa1b23c4d # Timestamps in nanoseconds
+fileHdrLen = 24
+recHdrLen = 16
+
+class PcapFile:
+  # Takes a filehandle to a pcap file
+  # The file is scanned once for record headers, packet data is never copied here
+  # Pass scan=False if the record index will be supplied by the caller
+  def __init__(self, f, scan=True):
+    st = os.fstat(f.fileno())
+    self.size = st.st_size
+    self.mtime = st.st_mtime
+    self.dev = st.st_dev
+    self.ino = st.st_ino
+    if(self.size < fileHdrLen):
+      raise PcapError, "Truncated pcap header"
+    self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, = struct.unpack_from('<I', self.mm, 0)
+    if(magic in (magicMicro, magicNano)):
+      self.endian = '<'
+    else:
+      magic, = struct.unpack_from('>I', self.mm, 0)
+      if(magic in (magicMicro, magicNano)):
+        self.endian = '>'
+      else:
+        raise PcapError, "Bad pcap magic"
+
+    if(magic == magicNano):
+      self.tsRes = 1000000000.0
+    else:
+      self.tsRes = 1000000.0
+
+    self.header = self.mm[:fileHdrLen]
+    hdr = struct.unpack_from(self.endian + 'IHHiIII', self.header)
+    self.snapLen = hdr[5]
+    self.datalink = hdr[6] # http://www.tcpdump.org/linktypes.html
+
+    # Our record index, one entry per record
+    self.offsets = array('L') # Offset of packet data, not of record header
+    self.caplens = array('I')
+    self.secs = array('I')
+    self.fracs = array('I') # Micro or nanoseconds depending on tsRes
+    if(scan):
+      self.scan()
+
+  # Builds our record index
+  # A truncated trailing record is ignored
+  def scan(self):
+    recHdr = struct.Struct(self.endian + 'IIII')
+    unpack = recHdr.unpack_from
+    mm = self.mm
+    size = self.size
+    offsets = self.offsets
+    caplens = self.caplens
+    secs = self.secs
+    fracs = self.fracs
+
+    off = fileHdrLen
+    while(off + recHdrLen <= size):
+      sec, frac, caplen, origlen = unpack(mm, off)
+      off += recHdrLen
+      if(off + caplen > size):
+        break
+      offsets.append(off)
+      caplens.append(caplen)
+      secs.append(sec)
+      fracs.append(frac)
+      off += caplen
+
+  def __len__(self):
+    return len(self.offsets)
+
+  # Returns packet data of record ii as a read-only buffer into our map
+  def pkt(self, ii):
+    return buffer(self.mm, self.offsets[ii], self.caplens[ii])
+
+  # Returns the start and end offsets of record ii, record header included
+  def span(self, ii):
+    return self.offsets[ii] - recHdrLen, self.offsets[ii] + self.caplens[ii]
+
+  # Returns timestamp of record ii as float seconds
+  def ts(self, ii):
+    return self.secs[ii] + (self.fracs[ii] / self.tsRes)
+
+  # Releases our map, and with it the file it holds open
+  def close(self):
+    self.mm.close()
+
+# Writes pcap files in large chunks
+# Records copied from a PcapFile are written straight from its map, adjacent records in one write
+# Nothing reaches the file until flush() is called
+class PcapWriter:
+  # Takes a filehandle and the PcapFile we copy records from
+  # Without a PcapFile we write microsecond timestamps with passed datalink
+  def __init__(self, f, pcap=None, datalink=1):
+    self.f = f
+    self.pcap = pcap
+    self.chunks = [] # Strings waiting to be written
+    self.chunkLen = 0
+    self.spanStart = self.spanEnd = 0 # Pending span of records in the map of self.pcap
+
+    # Our file header MUST match the endianness and resolution of any records we copy
+    if(pcap):
+      self.endian = pcap.endian
+      self.tsRes = pcap.tsRes
+      header = pcap.header
+    else:
+      self.endian = '<'
+      self.tsRes = 1000000.0
+      header = struct.pack(self.endian + 'IHHiIII', magicMicro, 2, 4, 0, 0, 65535, datalink)
+    self.recHdr = struct.Struct(self.endian + 'IIII')
+    self.write(header)
+
+  # Queues a string for writing
+  def write(self, s):
+    self.flushSpan()
+    self.chunks.append(s)
+    self.chunkLen += len(s)
+    if(self.chunkLen >= cfg.writeBufSize):
+      self.flushChunks()
+
+  # Copies record ii of our PcapFile untouched
+  def copyRecord(self, ii):
+    start, end = self.pcap.span(ii)
+    if(start == self.spanEnd and self.spanEnd > self.spanStart):
+      self.spanEnd = end
+    else:
+      self.flushSpan()
+      self.flushChunks()
+      self.spanStart, self.spanEnd = start, end
+
+  # Writes a record of packet data with a timestamp in seconds and fractions of tsRes
+  def writeRecord(self, data, sec, frac):
+    self.write(self.recHdr.pack(sec, frac, len(data), len(data)))
+    self.write(data)
+
+  # Writes a record of packet data with a timestamp in float seconds
+  def writePkt(self, data, ts):
+    self.write(self.recHeader(len(data), ts))
+    self.write(data)
+
+  # Returns the record header for length bytes of packet data with a timestamp in float seconds
+  def recHeader(self, length, ts):
+    sec = int(ts)
+    frac = int(round((ts - sec) * self.tsRes))
+    if(frac >= self.tsRes):
+      sec += 1
+      frac -= int(self.tsRes)
+    return self.recHdr.pack(sec, frac, length, length)
+
+  # Writes out everything queued so far
+  def flush(self):
+    self.flushSpan()
+    self.flushChunks()
+
+  # SHOULD never be called outside of class
+  def flushChunks(self):
+    if(self.chunkLen > 0):
+      self.f.write(''.join(self.chunks))
+      self.chunks = []
+      self.chunkLen = 0
+
+  # SHOULD never be called outside of class
+  def flushSpan(self):
+    if(self.spanEnd > self.spanStart):
+      self.f.write(buffer(self.pcap.mm, self.spanStart, self.spanEnd - self.spanStart))
+      self.spanStart = self.spanEnd = 0
+
+class PcapError(Exception):
+  pass
@@ -0,0 +1,239 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+'''A list of packets that are only decoded when someone looks at them'''
+
+from bisect import bisect_right
+from collections import OrderedDict
+
+# hexcap specific imports
+import cfg
+
+# Members of a PacketList are either decoded packet objects or records
+# A record is an integer index into the record index of the pcap file we were read from
+# Records are decoded on first access and the result is kept in a bounded LRU
+# Decoded packets that get dirty are pinned, they are moved out of the LRU so they are never evicted
+# Members are kept in chunks of about chunkSize, so inserting or removing a range of members
+# only moves members of the chunks at either end of that range
+class PacketList:
+  # Takes a function that turns a record into a packet object
+  def __init__(self, decode=None, lruSize=cfg.lruSize, chunkSize=cfg.chunkSize):
+    self._chunks = [] # Lists of packets and records in capture order
+    self._starts = [] # Zero based index of the first member of every chunk
+    self._len = 0
+    self._lru = OrderedDict() # Decoded records, oldest first
+    self._pinned = {} # Decoded records that are never evicted, edited or decoded up front
+    self.decode = decode
+    self.lruSize = lruSize
+    self.chunkSize = chunkSize
+    self.rearranged = False # Has anything been inserted, removed or appended that is not a record
+
+  def __len__(self):
+    return self._len
+
+  def __getitem__(self, ii):
+    c, off = self._locate(ii)
+    return self._fetch(self._chunks[c][off])
+
+  def __iter__(self):
+    for chunk in self._chunks:
+      for item in chunk:
+        yield self._fetch(item)
+
+  # Returns chunk and offset within that chunk of passed zero based index
+  # SHOULD never be called outside of class
+  def _locate(self, ii):
+    if(ii < 0):
+      ii += self._len
+    if(ii < 0 or ii >= self._len):
+      raise IndexError, "packet index out of range"
+    c = bisect_right(self._starts, ii) - 1
+    return c, ii - self._starts[c]
+
+  # Recomputes where chunks start from chunk c onwards
+  # SHOULD never be called outside of class
+  def _reindex(self, c):
+    del self._starts[c:]
+    if(c > 0):
+      pos = self._starts[c - 1] + len(self._chunks[c - 1])
+    else:
+      pos = 0
+    for chunk in self._chunks[c:]:
+      self._starts.append(pos)
+      pos += len(chunk)
+    self._len = pos
+
+  # Merges chunk c with the chunk after it if both fit in one chunk
+  # SHOULD never be called outside of class
+  def _merge(self, c):
+    if(0 <= c < len(self._chunks) - 1):
+      if(len(self._chunks[c]) + len(self._chunks[c + 1]) <= self.chunkSize):
+        self._chunks[c].extend(self._chunks.pop(c + 1))
+
+  # Returns the packet for passed item, decoding it if necessary
+  # SHOULD never be called outside of class
+  def _fetch(self, item):
+    if(not isinstance(item, int)):
+      return item
+    elif(item in self._pinned):
+      return self._pinned[item]
+    elif(item in self._lru):
+      pkt = self._lru.pop(item)
+      self._lru[item] = pkt
+      return pkt
+
+    pkt = self.decode(item)
+    self._lru[item] = pkt
+    while(len(self._lru) > self.lruSize):
+      rec, old = self._lru.popitem(False)
+      if(old.dirty):
+        self._pinned[rec] = old
+    return pkt
+
+  # Forgets any decoded packet we hold for passed item
+  # Returns the packet
+  def _release(self, item):
+    pkt = self._fetch(item)
+    if(isinstance(item, int)):
+      self._lru.pop(item, None)
+      self._pinned.pop(item, None)
+    return pkt
+
+  # Is passed item currently decoded
+  # SHOULD never be called outside of class
+  def _resident(self, item):
+    return (not isinstance(item, int)) or (item in self._lru) or (item in self._pinned)
+
+  # Appends a record or packet object
+  # A record may be passed along with its packet object, which is then pinned
+  def append(self, item, pkt=None):
+    if(not self._chunks or len(self._chunks[-1]) >= self.chunkSize):
+      self._chunks.append([])
+      self._starts.append(self._len)
+    self._chunks[-1].append(item)
+    self._len += 1
+    if(not isinstance(item, int)):
+      self.rearranged = True
+    if(pkt):
+      self._pinned[item] = pkt
+
+  # Appends records or packet objects from passed iterable
+  # Fills whole chunks at a time
+  def extend(self, items):
+    items = list(items)
+    for item in items:
+      if(not isinstance(item, int)):
+        self.rearranged = True
+        break
+
+    ii = 0
+    while(ii < len(items)):
+      if(not self._chunks or len(self._chunks[-1]) >= self.chunkSize):
+        self._chunks.append([])
+        self._starts.append(self._len + ii)
+      chunk = self._chunks[-1]
+      room = self.chunkSize - len(chunk)
+      chunk.extend(items[ii:ii + room])
+      ii += room
+    self._len += len(items)
+
+  def insert(self, ii, pkt):
+    self.insertRange(ii, [pkt])
+
+  # Inserts passed packet objects before zero based index ii
+  # Like list.insert() an index past either end inserts at that end
+  def insertRange(self, ii, pkts):
+    pkts = list(pkts)
+    if(len(pkts) == 0):
+      return
+    self.rearranged = True
+
+    if(ii < 0):
+      ii = max(0, ii + self._len)
+    if(not self._chunks):
+      self._chunks.append([])
+      self._starts.append(0)
+    if(ii >= self._len):
+      c = len(self._chunks) - 1
+      off = len(self._chunks[c])
+    else:
+      c, off = self._locate(ii)
+
+    # Oversized chunks are split so no chunk grows much past chunkSize
+    chunk = self._chunks[c]
+    chunk[off:off] = pkts
+    if(len(chunk) > 2 * self.chunkSize):
+      self._chunks[c:c + 1] = [chunk[jj:jj + self.chunkSize] for jj in xrange(0, len(chunk), self.chunkSize)]
+    self._reindex(c)
+
+  def pop(self, ii=-1):
+    return self.popRange(ii, ii)[0]
+
+  # Removes members from zero based index first through last inclusive
+  # Returns their packets in order as a list
+  def popRange(self, first, last):
+    if(first < 0):
+      first += self._len
+    if(last < 0):
+      last += self._len
+    if(first > last):
+      return []
+    self._locate(last) # Raises IndexError if we run off the end
+    c, off = self._locate(first)
+    self.rearranged = True
+
+    rv = []
+    cc = c
+    remaining = last - first + 1
+    while(remaining > 0):
+      chunk = self._chunks[cc]
+      end = min(len(chunk), off + remaining)
+      for item in chunk[off:end]:
+        rv.append(self._release(item))
+      del chunk[off:end]
+      remaining -= end - off
+      off = 0
+      cc += 1
+
+    # Drop emptied chunks and keep the ones at either end from getting small
+    self._chunks[c:cc] = [chunk for chunk in self._chunks[c:cc] if chunk]
+    self._merge(c)
+    self._merge(c - 1)
+    self._reindex(max(0, c - 1))
+    return rv
+
+  # Returns the record at passed zero based index
+  # Returns None if that member did not come from our pcap file
+  def record(self, ii):
+    c, off = self._locate(ii)
+    item = self._chunks[c][off]
+    if(isinstance(item, int)):
+      return item
+    return None
+
+  # Is passed zero based index currently decoded
+  def isDecoded(self, ii):
+    c, off = self._locate(ii)
+    return self._resident(self._chunks[c][off])
+
+  # Yields (record, packet) for every decoded record in no particular order
+  # Never decodes anything
+  def resident(self):
+    for item in self._pinned.iteritems():
+      yield item
+    for item in self._lru.iteritems():
+      yield item
+
+  # Yields (index, packet) for every decoded packet from first
+  # Never decodes anything
+  def decoded(self, first=0):
+    ii = 0
+    for chunk in self._chunks:
+      for item in chunk:
+        if(ii >= first and self._resident(item)):
+          yield ii, self._fetch(item)
+        ii += 1
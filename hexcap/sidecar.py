@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+'''On-disk index kept beside a pcap file so large captures reopen quickly'''
+
+import os
+import hashlib
+import inspect
+import struct
+from array import array
+
+# hexcap specific imports
+import cfg
+import layer
+
+# Bump this whenever the layout of Index changes
+version = 2
+
+# Our file is a header, then our record arrays as written by array.tofile(), then our
+# layer stacks as text, one per line with layer class names separated by spaces
+# Nothing in it is ever executed, a bad file only fails our checks and gets rebuilt
+# Arrays are written in native byte order and item size, both are checked by the header
+magic = 0x48584458
+header = struct.Struct('=IIQd32sIIIII') # magic, version, size, mtime, md5, datalink, records, stacks, L and I item sizes
+
+# How many leading bytes of a pcap file go into its hash
+hashLen = 65536
+
+class Index:
+  # Takes a PcapFile object that has already been scanned
+  def __init__(self, pcap):
+    self.key = fileKey(pcap)
+    self.datalink = pcap.datalink
+    self.offsets = pcap.offsets
+    self.caplens = pcap.caplens
+    self.secs = pcap.secs
+    self.fracs = pcap.fracs
+
+    self.sigTable = [] # Unique layer stacks as tuples of layer class names
+    self.sigs = array('I') # Index into sigTable for every record
+
+  # Records the layer stack of the next record as returned by Packet.layerSig()
+  # Must be called once for every record in order
+  def addSig(self, classes):
+    self.sigs.append(self.sigIndex(classes))
+
+  # Records the layer stack of record rec again after it has been rewritten
+  def setSig(self, rec, classes):
+    self.sigs[rec] = self.sigIndex(classes)
+
+  # Returns where passed layer stack is in sigTable, adding it if it is not
+  # SHOULD never be called outside of class
+  def sigIndex(self, classes):
+    sig = tuple(cls.__name__ for cls in classes)
+    try:
+      return self.sigTable.index(sig)
+    except ValueError:
+      self.sigTable.append(sig)
+      return len(self.sigTable) - 1
+
+  # Copies our record index into passed PcapFile object
+  def restore(self, pcap):
+    pcap.offsets = self.offsets
+    pcap.caplens = self.caplens
+    pcap.secs = self.secs
+    pcap.fracs = self.fracs
+
+# Returns what we know about a pcap file as a tuple of (size, mtime, hash)
+# Takes a PcapFile object
+def fileKey(pcap):
+  return (pcap.size, pcap.mtime, hashlib.md5(pcap.mm[:hashLen]).hexdigest())
+
+# Returns the sidecar file name for passed pcap file name
+def idxName(fName):
+  return fName + cfg.idxSuffix
+
+# Is passed name that of one of our layer classes
+def isLayer(name):
+  cls = getattr(layer, name, None)
+  return inspect.isclass(cls) and issubclass(cls, layer.Layer)
+
+# Returns Index for passed pcap file name and PcapFile object
+# Returns None if there is no index or it is stale or unreadable
+def load(fName, pcap):
+  try:
+    f = open(idxName(fName), 'rb')
+  except IOError:
+    return None
+
+  idx = Index(pcap)
+  try:
+    hdr = header.unpack(f.read(header.size))
+    if(hdr[:2] != (magic, version) or hdr[8:] != (array('L').itemsize, array('I').itemsize)):
+      return None
+    if(hdr[2:5] != idx.key or hdr[5] != pcap.datalink):
+      return None
+
+    records, stacks = hdr[6:8]
+    idx.offsets = array('L')
+    idx.caplens = array('I')
+    idx.secs = array('I')
+    idx.fracs = array('I')
+    for arr in (idx.offsets, idx.caplens, idx.secs, idx.fracs, idx.sigs):
+      arr.fromfile(f, records)
+
+    lines = f.read().split('\n')
+  except (IOError, EOFError, struct.error):
+    return None
+  finally:
+    f.close()
+
+  if(len(lines) != stacks + 1 or lines[-1] != ''):
+    return None
+  idx.sigTable = [tuple(line.split()) for line in lines[:-1]]
+  for sig in idx.sigTable:
+    for name in sig:
+      if(not isLayer(name)):
+        return None
+  if(records > 0 and max(idx.sigs) >= stacks):
+    return None
+  return idx
+
+# Writes passed Index beside pcap file fName
+# Returns False if it could not be written, we can always rebuild it
+def save(fName, idx):
+  tmpName = idxName(fName) + '.tmp'
+  size, mtime, md5 = idx.key
+  try:
+    f = open(tmpName, 'wb')
+    f.write(header.pack(magic, version, size, mtime, md5, idx.datalink, len(idx.offsets), len(idx.sigTable),
+                        array('L').itemsize, array('I').itemsize))
+    for arr in (idx.offsets, idx.caplens, idx.secs, idx.fracs, idx.sigs):
+      arr.tofile(f)
+    f.write(''.join([' '.join(sig) + '\n' for sig in idx.sigTable]))
+    f.close()
+    os.rename(tmpName, idxName(fName))
+  except (IOError, OSError):
+    return False
+  return True
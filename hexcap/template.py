@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+'''Generator packets compiled to a byte template and the fields to patch into it'''
+
+import sys
+sys.path.insert(0, sys.path[0] + '/../dpkt/')
+import dpkt
+
+# hexcap specific imports
+import cfg
+import counter
+
+# A checksum field of a template and the bytes it covers
+class Checksum:
+  # Takes offset of the checksum field and the start and end of what it covers
+  # pseudo holds (start, end) ranges of a pseudo header, they MUST be word aligned with start
+  # zeroIsNone is set for UDP, which sends a computed checksum of 0 as 0xffff
+  def __init__(self, off, start, end, pseudo=[], zeroIsNone=False):
+    self.off = off
+    self.start = start
+    self.ranges = [(start, end)] + pseudo
+    self.zeroIsNone = zeroIsNone
+
+  # Does this checksum cover the byte at off
+  def covers(self, off):
+    for start, end in self.ranges:
+      if(start <= off < end):
+        return True
+    return False
+
+  # Returns ones complement sum of the covered bytes of passed string placed at off
+  def weigh(self, off, s):
+    rv = 0
+    for ii in xrange(len(s)):
+      if(self.covers(off + ii)):
+        if((off + ii - self.start) % 2 == 0):
+          rv += ord(s[ii]) << 8
+        else:
+          rv += ord(s[ii])
+    return fold(rv)
+
+  # Replaces a covered value summing to old with one summing to new in passed bytearray
+  # RFC 1624 eqn. 3, HC' = ~(~HC + ~m + m')
+  def update(self, buf, old, new):
+    hc = (buf[self.off] << 8) | buf[self.off + 1]
+    hc = ~fold((~hc & 0xffff) + (~old & 0xffff) + new) & 0xffff
+    if(hc == 0 and self.zeroIsNone):
+      hc = 0xffff
+    buf[self.off] = hc >> 8
+    buf[self.off + 1] = hc & 0xff
+
+# A generated column as a run of bytes in a template
+class Patch:
+  # Takes offset of our bytes in the template, and our bytes for every count of our generator
+  def __init__(self, off, vals):
+    self.off = off
+    self.end = off + len(vals[0])
+    self.vals = vals
+    self.count = len(vals)
+    self.sums = [] # [Checksum, sum of our bytes for every count] for every checksum covering us
+
+  # Adds a checksum that covers us
+  def addChecksum(self, cs):
+    self.sums.append([cs, [cs.weigh(self.off, val) for val in self.vals]])
+
+# The first packet of a generator packet plus everything that changes from one packet to the next
+class Template:
+  def __init__(self, base, patches, numPkts):
+    self.base = base
+    self.patches = patches
+    self.numPkts = numPkts
+
+  # Moves buf from the counts in cur to those of generated packet ii
+  # SHOULD never be called outside of class
+  def advance(self, buf, cur, ii):
+    for jj in xrange(len(self.patches)):
+      p = self.patches[jj]
+      k = ii % p.count
+      if(k != cur[jj]):
+        buf[p.off:p.end] = p.vals[k]
+        for cs, sums in p.sums:
+          cs.update(buf, sums[cur[jj]], sums[k])
+        cur[jj] = k
+
+  # Returns generated packet ii as a string
+  def frame(self, ii):
+    buf = bytearray(self.base)
+    self.advance(buf, [0] * len(self.patches), ii)
+    return str(buf)
+
+  # Yields every generated packet as a string
+  # Only the bytes of patches whose count changes are touched
+  def frames(self):
+    buf = bytearray(self.base)
+    cur = [0] * len(self.patches)
+    for ii in xrange(self.numPkts):
+      self.advance(buf, cur, ii)
+      yield str(buf)
+
+# Folds a ones complement sum to 16 bits
+def fold(s):
+  while(s >> 16):
+    s = (s & 0xffff) + (s >> 16)
+  return s
+
+# Returns Checksums of passed dpkt object chain, which MUST already have been packed
+# Also returns a set of offsets we cannot patch since they decide how dpkt checksums what follows
+def checksums(d):
+  rv = []
+  fixed = set()
+  off = 0
+  pseudo = None # Address ranges of the innermost IP header
+  while(isinstance(d, dpkt.Packet)):
+    end = off + len(d)
+    if(isinstance(d.data, dpkt.Packet)):
+      hdrEnd = end - len(d.data)
+    else:
+      hdrEnd = end
+
+    if(isinstance(d, dpkt.ip.IP)):
+      rv.append(Checksum(off + 10, off, hdrEnd))
+      pseudo = [(off + 12, off + 20)]
+      fixed.update((off + 6, off + 7, off + 9)) # Fragment offset and protocol
+    elif(isinstance(d, dpkt.ip6.IP6)):
+      pseudo = [(off + 8, off + 40)]
+      fixed.add(off + 6) # Next header
+    elif(isinstance(d, dpkt.tcp.TCP) and pseudo):
+      rv.append(Checksum(off + 16, off, end, pseudo))
+    elif(isinstance(d, dpkt.udp.UDP) and pseudo):
+      rv.append(Checksum(off + 6, off, end, pseudo, True))
+    elif(isinstance(d, dpkt.icmp6.ICMP6) and pseudo):
+      rv.append(Checksum(off + 2, off, end, pseudo))
+    elif(isinstance(d, (dpkt.icmp.ICMP, dpkt.igmp.IGMP))):
+      rv.append(Checksum(off + 2, off, end))
+
+    off = hdrEnd
+    d = d.data
+  return rv, fixed
+
+# Returns passed hex column value as a string of its bytes
+def colBytes(hs):
+  nibbles = cfg.cleanHexStr(hs)
+  width = (len(nibbles) + 1) // 2
+  return ('%0' + str(width * 2) + 'x') % int(nibbles, 16)
+
+# Returns passed hex column value with every nibble a Counter may change flipped
+def flipHexStr(hs):
+  rv = hs[0]
+  for c in hs[1:]:
+    if(ord(c) in cfg.hexChars):
+      rv += '%x' % (int(c, 16) ^ 15)
+    else:
+      rv += c
+  return rv
+
+# Compiles passed generator packet that expands to numPkts packets
+# We find where each generated column lives by packing the packet again with that column flipped
+# Returns a Template, or None if a column does not map to its own bytes or the result
+# does not match Packet.expand(), the caller must then expand the packet itself
+def compile(gPkt, numPkts):
+  d = gPkt.data()
+  base = str(d)
+  sums, fixed = checksums(d)
+  sumBytes = set()
+  for cs in sums:
+    sumBytes.update((cs.off, cs.off + 1))
+
+  patches = []
+  taken = sumBytes.union(fixed)
+  for jj in xrange(len(gPkt.layers)):
+    lay = gPkt.layers[jj]
+    for col,gDef in lay.gen.iteritems():
+      if(gDef['count'] < 2 or gDef['step'] == 0):
+        continue
+
+      ctr = counter.Counter(lay.vals[col], gDef['mask'])
+      vals = [ctr.count(k * gDef['step']) for k in xrange(gDef['count'])]
+      if(len(set(vals)) == 1):
+        continue
+
+      probe = gPkt.clone()
+      probe.layers[jj].vals[col] = flipHexStr(lay.vals[col])
+      flipped = str(probe.data())
+      if(len(flipped) != len(base)):
+        return None
+      diffs = [ii for ii in xrange(len(base)) if(base[ii] != flipped[ii] and not ii in sumBytes)]
+      if(len(diffs) == 0):
+        return None
+
+      width = len(colBytes(lay.vals[col])) // 2
+      off = diffs[-1] - width + 1
+      if(diffs[0] < off):
+        return None
+      if(base[off:off + width].encode('hex') != colBytes(lay.vals[col])):
+        return None
+      if(flipped[off:off + width].encode('hex') != colBytes(probe.layers[jj].vals[col])):
+        return None
+      if(taken.intersection(xrange(off, off + width))):
+        return None
+      taken.update(xrange(off, off + width))
+
+      p = Patch(off, [colBytes(val).decode('hex') for val in vals])
+      for cs in sums:
+        if([ii for ii in xrange(p.off, p.end) if(cs.covers(ii))]):
+          p.addChecksum(cs)
+      patches.append(p)
+
+  rv = Template(base, patches, numPkts)
+  for ii in set([1, numPkts - 1]):
+    if(rv.frame(ii) != gPkt.expand(ii).pktStr()):
+      return None
+  return rv
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Times string key lookups on our hashed Assoc against the old linear scan Assoc
+# Column counts are sized like the sections hexcap draws
+# USAGE: benchAssoc.py [ LOOKUPS ]
+
+import sys
+import time
+utilDir = sys.path[0]
+sys.path.insert(0, utilDir + '/../hexcap/')
+import assoc
+
+# Assoc as it was before it kept a hash of its keys
+class LinearAssoc():
+  def __init__(self):
+    self._vals = []
+
+  def __repr__(self):
+    rv = ''
+    ii = -1
+    for k,v in self._vals:
+      ii += 1
+      if(k is None):
+        rv += "[" + str(ii) + "]:=\'" + str(v) + "\' "
+      else:
+        rv += "['" + k + "']:=\'" + str(v) + "\' "
+    return rv
+
+  # Returns index of self._vals list for passed key
+  # SHOULD never be called outside of class
+  def __getIndex__(self, key):
+    if(isinstance(key, int)):
+      if((key < len(self._vals)) and (key > -1)):
+        return key
+      else:
+        raise IndexError, "index out of range"        
+    elif(isinstance(key, str)):
+      ii = -1
+      for k,v in self._vals:
+        ii += 1
+        if(key == k):
+          return ii
+      raise IndexError, "nonexistent string index"
+    else:
+      raise TypeError, "unknown index type"
+
+  def __setitem__(self, key, val):
+    if(isinstance(key, int)):
+      try:
+        ii = self.__getIndex__(key)
+        self._vals[ii] = list(((self._vals[ii][0]), (val)))
+      except IndexError:
+        self._vals.append(list(((None), (val))))
+    elif(isinstance(key, str)):
+      self._vals.append(((key), (val)))
+    else:
+      raise TypeError, "unknown index type"
+
+  def __getitem__(self, key):
+    return self._vals[self.__getIndex__(key)][1]
+
+  def __iter__(self):
+    return LinearAssocIter(self._vals, False)
+
+  def __delitem__(self, key):
+    del self._vals[self.getIndex(key)]
+
+  def __len__(self):
+    return len(self._vals)
+
+  def __contains__(self, val):
+    for k,v in self._vals:
+      if(v == val):
+        return True
+    return False
+
+  # Called to translate a string key to integer
+  def getIntKey(self, index):
+    return self.__getIndex__(index)
+     
+  # Called to translate an integer key to string
+  # MUST return string even if key has only integer value
+  def getStrKey(self, index):
+    ii = self.__getIndex__(index)
+    if(self._vals[ii][0] == None):
+      return str(ii)
+    else:
+      return self._vals[ii][0]
+
+  def iteritems(self):
+    return LinearAssocIter(self._vals, True)
+
+  def items(self):
+    rv = []
+    ii = -1
+    for ii in xrange(len(self._vals)):
+      if(self._vals[ii][0] == None): 
+        rv.append(list(((str(ii)), (self._vals[ii][1]))))
+      else:
+        rv.append(list(((self._vals[ii][0]), (self._vals[ii][1]))))
+    return rv
+
+  def remove(self, key):
+    self.__delitem__(key)
+
+  def reverse(self):
+    self._vals.reverse()
+
+  def append(self, x):
+    self._vals.append(((None), (x)))
+
+  def pop(self):
+    return self._vals.pop()[1]
+
+  def extend(self, L):
+    if(len(L) < 1):
+      return
+
+    if(isinstance(L, LinearAssoc)):
+      for k,v in L:
+        self._vals.append(list(((k), (v))))
+    elif(isinstance(L, list)):
+      for v in L:
+        self._vals.append(list(((None), (v))))
+    else:
+      raise TypeError, "unknown type"
+
+  def insert(self, key, val):
+    self._vals.insert(self.getIndex(key), list(((None), (val))))
+
+  # Can return either a string or integer
+  def index(self, val):
+    ii = -1
+    for k,v in self._vals:
+      ii += 1
+      if(v == val):
+        if(k is None):
+          return ii
+        else:
+          return k
+    raise ValueError, "value not found"
+
+  def count(self, val):
+    cnt = 0
+    for k,v in self._vals:
+      if(val == v):
+        cnt += 1
+    return cnt
+
+class LinearAssocIter():
+  def __init__(self, vals, keys):
+    self._vals = vals
+    self.keys = keys
+    self.ii = -1
+
+  def __iter__(self):
+    return self
+
+  def next(self):
+    self.ii += 1
+    if(self.ii < len(self._vals)):
+      if(self.keys):
+        if(self._vals[self.ii][0] is None):
+          return str(self.ii), self._vals[self.ii][1]
+        else:
+          return self._vals[self.ii][0], self._vals[self.ii][1]
+      else:
+        return self._vals[self.ii][1]
+    else:
+      raise StopIteration
+
+# Returns best time in seconds out of 3 runs of lookups over every key of ass
+def bench(ass, keys, lookups):
+  best = None
+  for run in xrange(3):
+    start = time.time()
+    for ii in xrange(lookups / len(keys)):
+      for k in keys:
+        ass[k]
+    elapsed = time.time() - start
+    if(best is None or elapsed < best):
+      best = elapsed
+  return best
+
+if(len(sys.argv) > 1):
+  lookups = int(sys.argv[1])
+else:
+  lookups = 200000
+
+print "Lookups:" + str(lookups)
+for cols in [2, 6, 12, 48]:
+  keys = ['col' + str(ii) for ii in xrange(cols)]
+  linear = LinearAssoc()
+  hashed = assoc.Assoc()
+  for k in keys:
+    linear[k] = k
+    hashed[k] = k
+
+  oldT = bench(linear, keys, lookups)
+  newT = bench(hashed, keys, lookups)
+  print "columns:" + str(cols).rjust(3) + "  linear:" + "{:.4f}".format(oldT) + "s  hashed:" + \
+      "{:.4f}".format(newT) + "s  speedup:" + "{:.1f}".format(oldT / newT) + "x"
@@ -0,0 +1,141 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Checks counter.Counter against the old cfg.incHexStr() on random columns, masks and steps
+# Then times both counting columns the way generators do
+# USAGE: benchCounter.py [ CASES ] [ SEED ]
+
+import sys
+import time
+import random
+utilDir = sys.path[0]
+sys.path.insert(0, utilDir + '/../hexcap/')
+import cfg
+import counter
+
+# cfg.incHexStr() as it was before counter.py, one step at a time
+def incHexStr(hs, mask, step=1):
+  if(step > 0):
+    for ii in xrange(step):
+      for jj in xrange(len(hs) - 1, 0, -1):
+        if(ord(hs[jj]) in cfg.hexChars):
+          if(hs[jj] == 'f'):
+            hs = hs[:jj] + '0' + hs[jj+1:]
+          elif(int(hs[jj], 16) | int(mask[jj], 16) != 15):
+            hs = hs[:jj] + hex(int(hs[jj], 16) + 1)[2] + hs[jj+1:]
+            break
+  else:
+    for ii in xrange(0, step, -1):
+      for jj in xrange(len(hs) - 1, 0, -1):
+        if(ord(hs[jj]) in cfg.hexChars):
+          if(hs[jj] == '0'):
+            hs = hs[:jj] + 'f' + hs[jj+1:]
+          elif(int(hs[jj], 16) | int(mask[jj], 16) != int(mask[jj], 16)):
+            hs = hs[:jj] + hex(int(hs[jj], 16) - 1)[2] + hs[jj+1:]
+            break
+  return hs
+
+# Returns a random column as it would be displayed and a mask delimited the same way
+# Masks are either made like Layer.addMask() makes them or random digits
+def randColumn():
+  digits = ''.join([random.choice(counter.hexDigits) for ii in xrange(random.randint(1, 12))])
+  if(random.random() < 0.5):
+    bits = len(digits) * 4
+    ones = random.randint(0, bits - 1)
+    zeros = random.randint(1, bits - ones)
+    binMask = ('1' * ones + '0' * zeros).ljust(bits, '1')
+    maskDigits = '%0*x' % (len(digits), int(binMask, 2))
+  elif(random.random() < 0.5):
+    maskDigits = '0' * len(digits)
+  else:
+    maskDigits = ''.join([random.choice(counter.hexDigits) for ii in xrange(len(digits))])
+
+  delim = random.choice(['', '.', ':', ' '])
+  width = random.choice([1, 2, 4])
+  if(delim == ''):
+    return digits, maskDigits
+  split = lambda s: delim.join([s[ii:ii + width] for ii in xrange(0, len(s), width)])
+  return split(digits), split(maskDigits)
+
+# Returns a random step, mostly small so the old function finishes
+def randStep():
+  if(random.random() < 0.8):
+    return random.randint(-40, 40)
+  return random.randint(-3000, 3000)
+
+if(len(sys.argv) > 1):
+  cases = int(sys.argv[1])
+else:
+  cases = 20000
+if(len(sys.argv) > 2):
+  random.seed(int(sys.argv[2]))
+else:
+  random.seed(0)
+
+bad = 0
+for ii in xrange(cases):
+  hs, mask = randColumn()
+  step = randStep()
+  old = incHexStr(hs, mask, step)
+  new = counter.Counter(hs, mask).count(step)
+  if(old != new):
+    bad += 1
+    if(bad <= 10):
+      print "MISMATCH hs:" + hs + " mask:" + mask + " step:" + str(step) + " old:" + old + " new:" + new
+
+  # Counting step k times from the start is the same as counting k * step once
+  if(ii % 10 == 0):
+    k = random.randint(2, 20)
+    ctr = counter.Counter(hs, mask)
+    old = hs
+    for jj in xrange(1, k + 1):
+      old = incHexStr(old, mask, step)
+      if(old != ctr.count(jj * step)):
+        bad += 1
+        break
+print "Compared " + str(cases) + " random columns, mismatches:" + str(bad)
+
+# Times generating count values of a column like template.compile() does
+def timeOld(hs, mask, step, count):
+  start = time.time()
+  val = hs
+  for k in xrange(1, count):
+    val = incHexStr(val, mask, step)
+  return time.time() - start
+
+def timeNew(hs, mask, step, count):
+  start = time.time()
+  ctr = counter.Counter(hs, mask)
+  for k in xrange(1, count):
+    ctr.count(k * step)
+  return time.time() - start
+
+# Times Packet.expand() of generated packet ii, which counts a fresh column ii * step times
+def timeOldFar(hs, mask, step, ii):
+  start = time.time()
+  incHexStr(hs, mask, ii * step)
+  return time.time() - start
+
+def timeNewFar(hs, mask, step, ii):
+  start = time.time()
+  counter.Counter(hs, mask).count(ii * step)
+  return time.time() - start
+
+print "counting columns:"
+for name, hs, mask, step in (('ip src', 'c0.a8.00.01', '00.00.00.00', 1),
+                             ('ip src /24', 'c0.a8.00.01', 'ff.ff.ff.00', 3),
+                             ('mac', '00:1b:21:3a:4f:10', '00:00:00:00:00:00', 257),
+                             ('port', '0050', '0000', -1)):
+  count = 10000
+  o = timeOld(hs, mask, step, count)
+  n = timeNew(hs, mask, step, count)
+  print "  " + name.ljust(11) + " " + str(count) + " values  old " + "{:.4f}".format(o) + "s  new " + "{:.4f}".format(n) + "s  speedup " + "{:.1f}".format(o / n) + "x"
+
+  ii = 50000
+  o = timeOldFar(hs, mask, step, ii)
+  n = timeNewFar(hs, mask, step, ii)
+  print "  " + name.ljust(11) + " packet " + str(ii) + "  old " + "{:.4f}".format(o) + "s  new " + "{:.6f}".format(n) + "s  speedup " + "{:.0f}".format(o / n) + "x"
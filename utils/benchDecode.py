@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Times decoding pcap files through dpkt with our layer.decoders table against the old isinstance chain
+# Our own dissector is turned off so every packet goes through Packet.initLayers()
+# Also checks both ways give the same layers with the same values
+# USAGE: benchDecode.py [ RUNS ] [ FILE ... ]
+
+import sys
+import os
+import time
+utilDir = sys.path[0]
+sys.path.insert(0, utilDir + '/../hexcap/')
+import cfg
+import pcapfile
+import packet
+import layer
+import dpkt
+
+# Packet.initLayers() as it was before layer.decoders
+def chainInitLayers(self, d):
+  if(not isinstance(d, dpkt.Packet)):
+    return
+
+  # TODO: There has to be a better way to do this, but right now this must suffice
+  if(isinstance(d, dpkt.ethernet.Ethernet)):
+    if hasattr(d, 'vlan_tags'):
+      if isinstance(d.vlan_tags[0], dpkt.ethernet.VLANtagISL):
+        self.unsupport(d)
+        return
+      else:
+        for tag in d.vlan_tags:
+          self.layers.append(layer.Dot1q(tag))
+
+    if d.type > 1500:
+      self.layers.append(layer.EthernetII(d)) # Ethernet II
+      chainInitLayers(self, d.data)
+    elif d.type == dpkt.ethernet.ETH_TYPE_IPX: # IPX
+      self.unsupport(d)
+      return
+    else:
+      self.layers.append(layer.EthernetDot3(d)) # 802.3
+      chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.ieee80211.IEEE80211):
+    self.layers.append(layer.Dot11(d))
+    chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.llc.LLC):
+    self.layers.append(layer.LLC(d))
+    chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.cdp.CDP):
+    self.layers.append(layer.CDP(d))
+    return
+
+  elif isinstance(d, dpkt.edp.EDP):
+    self.layers.append(layer.EDP(d))
+    return
+
+  elif isinstance(d, dpkt.stp.STP):
+    self.layers.append(layer.STP(d))
+    chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.arp.ARP):
+    self.layers.append(layer.ARP(d))
+    chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.ip.IP):
+    self.layers.append(layer.IPv4(d))
+    chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.ip6.IP6):
+    self.layers.append(layer.IPv6(d))
+    chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.igmp.IGMP):
+    if(d.type == 0x22): # IGMPv3
+      self.unsupport(d)
+      return
+    else:
+      self.layers.append(layer.IGMP(d))
+      chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.icmp.ICMP):
+    self.layers.append(layer.ICMP(d))
+    return
+
+  elif isinstance(d, dpkt.tcp.TCP):
+    self.layers.append(layer.TCP(d))
+    chainInitLayers(self, d.data)
+
+  elif isinstance(d, dpkt.udp.UDP):
+    self.layers.append(layer.UDP(d))
+    chainInitLayers(self, d.data)
+
+  else:
+    self.unsupport(d)
+    return
+
+# Decodes every record of pcap
+# Returns a list with the layer classes and values of every packet, or the error decoding it
+def decodeAll(pcap):
+  rv = []
+  for ii in xrange(len(pcap)):
+    try:
+      pkt = packet.Packet(pcap.datalink, pcap.ts(ii), pcap.pkt(ii))
+      rv.append([(lay.__class__.__name__, repr(sorted(lay.vals.items()))) for lay in pkt.layers])
+    except Exception, e:
+      rv.append(e.__class__.__name__)
+  return rv
+
+# Returns best time in seconds to decode every record of pcap and the result of the last run
+def timeDecode(pcap, runs):
+  best = None
+  for ii in xrange(runs):
+    start = time.time()
+    rv = decodeAll(pcap)
+    elapsed = time.time() - start
+    if(best is None or elapsed < best):
+      best = elapsed
+  return best, rv
+
+if(len(sys.argv) > 1):
+  runs = int(sys.argv[1])
+else:
+  runs = 20
+if(len(sys.argv) > 2):
+  fNames = sys.argv[2:]
+else:
+  fNames = [utilDir + '/../traces/' + name for name in ['cdp.pcap', 'stp.pcap', 'ospf.pcap', 'dot1p-igmp.pcap', 'igmp_dataset.pcap', 'dot11_WAPauth.pcap', 'funk.pcap']]
+
+cfg.fastDissect = False
+tableInit = packet.Packet.initLayers
+totChain = totTable = 0
+for fName in fNames:
+  f = open(fName, 'rb')
+  pcap = pcapfile.PcapFile(f)
+
+  packet.Packet.initLayers = chainInitLayers
+  chainTime, chainLayers = timeDecode(pcap, runs)
+  packet.Packet.initLayers = tableInit
+  tableTime, tableLayers = timeDecode(pcap, runs)
+  bad = len([ii for ii in xrange(len(pcap)) if(chainLayers[ii] != tableLayers[ii])])
+  totChain += chainTime
+  totTable += tableTime
+
+  print os.path.basename(fName).ljust(20) + str(len(pcap)).rjust(6) + " packets  mismatches:" + str(bad) + "  chain " + "{:.4f}".format(chainTime) + "s  table " + "{:.4f}".format(tableTime) + "s  speedup " + "{:.2f}".format(chainTime / tableTime) + "x"
+  pcap.close()
+  f.close()
+print "total".ljust(20) + " " * 29 + "chain " + "{:.4f}".format(totChain) + "s  table " + "{:.4f}".format(totTable) + "s  speedup " + "{:.2f}".format(totChain / totTable) + "x"
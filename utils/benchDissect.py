@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Times decoding every packet of pcap files with and without our own dissector, see dissect.py
+# Also checks both ways give the same layers with the same values
+# USAGE: benchDissect.py [ RUNS ] [ FILE ... ]
+
+import sys
+import os
+import time
+utilDir = sys.path[0]
+sys.path.insert(0, utilDir + '/../hexcap/')
+import cfg
+import pcapfile
+import packet
+import dissect
+
+# Decodes every record of pcap
+# Returns a list with the layer classes and values of every packet, or the error decoding it
+def decodeAll(pcap):
+  rv = []
+  for ii in xrange(len(pcap)):
+    try:
+      pkt = packet.Packet(pcap.datalink, pcap.ts(ii), pcap.pkt(ii))
+      rv.append([(lay.__class__.__name__, repr(sorted(lay.vals.items()))) for lay in pkt.layers])
+    except Exception, e:
+      rv.append(e.__class__.__name__)
+  return rv
+
+# Returns best time in seconds to decode every record of pcap and the result of the last run
+def timeDecode(pcap, runs):
+  best = None
+  for ii in xrange(runs):
+    start = time.time()
+    rv = decodeAll(pcap)
+    elapsed = time.time() - start
+    if(best is None or elapsed < best):
+      best = elapsed
+  return best, rv
+
+if(len(sys.argv) > 1):
+  runs = int(sys.argv[1])
+else:
+  runs = 5
+if(len(sys.argv) > 2):
+  fNames = sys.argv[2:]
+else:
+  fNames = [utilDir + '/../traces/big.pcap', utilDir + '/../traces/funk.pcap']
+
+for fName in fNames:
+  f = open(fName, 'rb')
+  pcap = pcapfile.PcapFile(f)
+  fast = len([ii for ii in xrange(len(pcap)) if(dissect.dissect(pcap.datalink, str(pcap.pkt(ii))))])
+
+  cfg.fastDissect = False
+  dpktTime, dpktLayers = timeDecode(pcap, runs)
+  cfg.fastDissect = True
+  fastTime, fastLayers = timeDecode(pcap, runs)
+  bad = len([ii for ii in xrange(len(pcap)) if(dpktLayers[ii] != fastLayers[ii])])
+
+  print os.path.basename(fName) + " packets:" + str(len(pcap)) + " dissected:" + str(fast) + " mismatches:" + str(bad)
+  print "  dpkt " + "{:.4f}".format(dpktTime) + "s  dissect " + "{:.4f}".format(fastTime) + "s  speedup " + "{:.1f}".format(dpktTime / fastTime) + "x"
+  pcap.close()
+  f.close()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Times a full redraw of every packet line in a capture
+# Compares our direct curses wrappers against the old eval() based wrappers
+# Must be run from a terminal
+# USAGE: benchDraw.py [ FILE ] [ RUNS ]
+
+import sys
+import time
+import curses
+utilDir = sys.path[0]
+sys.path.insert(0, utilDir + '/../hexcap/')
+import cfg
+import capture
+import hexscreen
+
+# The drawing wrappers as they were before they called curses directly
+class EvalScreen(hexscreen.HexScreen):
+  def ppadAddStr(self, y, x, s, atr=None):
+    if(atr):
+      self.genericTry("self.ppad.addstr(" + str(y) + "," + str(x) + ",'" + s + "'," + str(atr) + ")")
+    else:
+      self.genericTry("self.ppad.addstr(" + str(y) + "," + str(x) + ",'" + s + "')")
+
+  def ppadHLine(self, y, x, char, width, atr=None):
+    if(atr):
+      self.genericTry("self.ppad.hline(" + str(y) + "," + str(x) + ",'" + char + "'," + str(width) + "," + str(atr) + ")")
+    else:
+      self.genericTry("self.ppad.hline(" + str(y) + "," + str(x) + ",'" + char + "'," + str(width) + ")")
+
+# Draws a packet line onto the ppad of passed HexScreen as HexScreen.drawPktLine() did
+# Takes a y value and list of cells that correlates to its global header list
+def drawPktLine(scr, y, row):
+  scr.drawSegments(y, scr.lineSegments(row))
+
+# Draws every packet line onto a pad big enough for all of them
+# Returns best time in seconds out of runs
+def redraw(scr, rows, runs):
+  best = None
+  for ii in xrange(runs):
+    scr.winTop = 0
+    scr.ppad = curses.newpad(len(rows), scr.ppadWidth)
+    start = time.time()
+    for y in xrange(len(rows)):
+      drawPktLine(scr, y, rows[y])
+    elapsed = time.time() - start
+    if(best is None or elapsed < best):
+      best = elapsed
+  return best
+
+if(len(sys.argv) > 1):
+  fName = sys.argv[1]
+else:
+  fName = utilDir + '/../traces/big.pcap'
+if(len(sys.argv) > 2):
+  runs = int(sys.argv[2])
+else:
+  runs = 5
+
+f = open(fName, 'rb')
+cap = capture.Capture(f, fName)
+f.close()
+rows = [cap.packets[ii].out(ii + 1) for ii in xrange(len(cap.packets))] # Decoding is not what we're timing
+
+scr = hexscreen.HexScreen()
+scr.initPad(cap)
+direct = redraw(scr, rows, runs)
+scr.__class__ = EvalScreen
+evald = redraw(scr, rows, runs)
+curses.endwin()
+
+print "Packets:" + str(len(rows)) + " runs:" + str(runs)
+print "eval() wrappers:  " + "{:.4f}".format(evald) + "s"
+print "direct wrappers:  " + "{:.4f}".format(direct) + "s"
+print "speedup:          " + "{:.1f}".format(evald / direct) + "x"
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Times hex decoding and encoding of layers with hexcodec against the old per byte functions
+# Records every Layer.pcapToHexStr() and Layer.hexStrToPcap() call made loading every trace
+# and packing every layer, then replays them with both and checks they agree
+# USAGE: benchHexCodec.py [ RUNS ] [ FILE ... ]
+
+import sys
+import os
+import glob
+import time
+utilDir = sys.path[0]
+sys.path.insert(0, utilDir + '/../hexcap/')
+import cfg
+import layer
+import capture
+import hexcodec
+
+# Layer.pcapToHexStr() as it was before hexcodec
+def oldToHex(bytes, delim, ln=2):
+  rv = ""
+  trv = ""
+  for b in bytes:
+    trv += hex(ord(b)).split("0x")[1].rjust(2, "0")
+    if(len(trv) >= ln):
+      rv += trv + delim
+      trv = ""
+  return rv.rstrip(delim)
+
+# Layer.hexStrToPcap() as it was before hexcodec
+def oldFromHex(s, delim, ln=2):
+  rv = ""
+  bytes = s.split(delim)
+
+  if(ln != 2):
+    if((ln % 2 != 0) or (ln < 2)):
+      return False
+    else:
+      newbytes = []
+      for b in bytes:
+         for ii in xrange(0, ln, 2):
+          newbytes.append(b[ii:ii+2])
+      bytes = newbytes
+
+  for b in bytes:
+    rv += chr(int(b, 16))
+  return rv
+
+# Calls made by each layer class as {class name: [args]}
+decodes = {}
+encodes = {}
+
+def recToHex(self, *args):
+  decodes.setdefault(self.__class__.__name__, []).append(args)
+  return hexcodec.toHex(*args)
+
+def recFromHex(self, *args):
+  encodes.setdefault(self.__class__.__name__, []).append(args)
+  return hexcodec.fromHex(*args)
+
+# Returns best time in seconds of runs calls of f with every args in calls
+def timeCalls(f, calls, runs):
+  best = None
+  for ii in xrange(runs):
+    start = time.time()
+    for args in calls:
+      f(*args)
+    elapsed = time.time() - start
+    if(best is None or elapsed < best):
+      best = elapsed
+  return best
+
+if(len(sys.argv) > 1):
+  runs = int(sys.argv[1])
+else:
+  runs = 5
+if(len(sys.argv) > 2):
+  fNames = sys.argv[2:]
+else:
+  fNames = sorted(glob.glob(utilDir + '/../traces/*.pcap'))
+
+layer.Layer.pcapToHexStr = recToHex
+layer.Layer.hexStrToPcap = recFromHex
+for fName in fNames:
+  f = open(fName, 'rb')
+  try:
+    cap = capture.Capture(f, fName)
+  except Exception, e:
+    print "Skipping " + os.path.basename(fName) + ": " + str(e)
+    continue
+  finally:
+    f.close()
+  for pkt in cap.packets:
+    for lay in pkt.layers:
+      lay.toPcap()
+
+bad = 0
+for calls, old, new in ((decodes, oldToHex, hexcodec.toHex), (encodes, oldFromHex, hexcodec.fromHex)):
+  for args in [args for name in calls for args in calls[name]]:
+    if(old(*args) != new(*args)):
+      bad += 1
+print "Traces:" + str(len(fNames)) + " runs:" + str(runs) + " mismatches:" + str(bad)
+
+for title, calls, old, new in (('decode', decodes, oldToHex, hexcodec.toHex), ('encode', encodes, oldFromHex, hexcodec.fromHex)):
+  print title + ":"
+  totOld = totNew = 0
+  for name in sorted(calls):
+    o = timeCalls(old, calls[name], runs)
+    n = timeCalls(new, calls[name], runs)
+    totOld += o
+    totNew += n
+    print "  " + name.ljust(12) + str(len(calls[name])).rjust(8) + " calls  old " + "{:.4f}".format(o) + "s  new " + "{:.4f}".format(n) + "s  speedup " + "{:.1f}".format(o / n) + "x"
+  print "  " + "total".ljust(12) + " " * 14 + "old " + "{:.4f}".format(totOld) + "s  new " + "{:.4f}".format(totNew) + "s  speedup " + "{:.1f}".format(totOld / totNew) + "x"
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Compares memory used by decoded layers in each layout they have had
+# dict:  old style layers each with a dict of their own holding a vals dict and a gen dict
+# vals:  old style layers each with a dict of their own holding a schema backed Vals
+# slots: layers with slots holding a schema backed Vals, as they are now
+# Each mode decodes FILE COPIES times in its own process and reports growth of max RSS
+# USAGE: benchLayerMem.py [ FILE ] [ COPIES ]
+
+import sys
+import os
+import imp
+import time
+import resource
+import subprocess
+utilDir = sys.path[0]
+hexcapDir = utilDir + '/../hexcap/'
+sys.path.insert(0, hexcapDir)
+import cfg
+
+# Layer.__init__ as it was before layers had a schema
+def dictInit(self):
+  self.vals = {}
+  self.gen = {}
+  self.dirty = False
+
+# Loads our layer module with Layer as an old style class
+# Old style classes ignore __slots__, so every layer gets a dict of its own again
+def loadOldStyle():
+  fName = hexcapDir + 'layer.py'
+  src = open(fName).read().replace('class Layer(object):', 'class Layer:')
+  mod = imp.new_module('layer')
+  mod.__file__ = fName
+  sys.modules['layer'] = mod
+  exec compile(src, fName, 'exec') in mod.__dict__
+  return mod
+
+# Decodes fName copies times and prints packets, KB of RSS growth and seconds taken
+def measure(fName, copies, mode):
+  if(mode != 'slots'):
+    layer = loadOldStyle()
+    if(mode == 'dict'):
+      layer.Layer.__init__ = dictInit
+  import capture
+
+  before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  start = time.time()
+  caps = []
+  for ii in xrange(copies):
+    f = open(fName, 'rb')
+    caps.append(capture.Capture(f, fName))
+    f.close()
+  elapsed = time.time() - start
+  after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  print sum([len(cap.packets) for cap in caps]), after - before, elapsed
+
+if(len(sys.argv) > 3): # Child process
+  measure(sys.argv[1], int(sys.argv[2]), sys.argv[3])
+  sys.exit(0)
+
+if(len(sys.argv) > 1):
+  fName = sys.argv[1]
+else:
+  fName = utilDir + '/../traces/big.pcap'
+if(len(sys.argv) > 2):
+  copies = int(sys.argv[2])
+else:
+  copies = 50
+
+res = {}
+for mode in ['dict', 'vals', 'slots']:
+  out = subprocess.check_output([sys.executable, os.path.abspath(__file__), fName, str(copies), mode])
+  pkts, kb, elapsed = out.split()
+  res[mode] = [int(pkts), int(kb), float(elapsed)]
+  print mode.ljust(5) + " packets:" + pkts + "  RSS growth:" + str(int(kb) / 1024) + "MB  " + \
+      str(int(kb) * 1024 / int(pkts)) + " bytes/packet  load:" + "{:.2f}".format(float(elapsed)) + "s"
+
+for mode in ['vals', 'slots']:
+  print mode.ljust(5) + " saved:" + str((res['dict'][1] - res[mode][1]) * 1024 / res[mode][0]) + " bytes/packet"
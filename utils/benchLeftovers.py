@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Times building Leftovers layers viewing their frame against the old layer that packed its dpkt object
+# Records every Leftovers made loading pcap files, then builds them again both ways
+# Each is built again padded out to a jumbo frame, where copying the payload costs most
+# Also checks both ways display the same
+# USAGE: benchLeftovers.py [ RUNS ] [ FILE ... ]
+
+import sys
+import os
+import glob
+import time
+utilDir = sys.path[0]
+sys.path.insert(0, utilDir + '/../hexcap/')
+import cfg
+import layer
+import capture
+
+jumbo = 9000 # Bytes in a jumbo frame
+
+# Leftovers as it was before viewing its frame
+class OldLeftovers(layer.Leftovers):
+  def __init__(self, data):
+    layer.Layer.__init__(self)
+    self.data = data
+
+    s = self.pcapToHexStr(data.pack(), ":", len(data.pack()))
+    s = s[:self.uWidth - self.dotWidth]
+    for ii in xrange(self.dotWidth):
+      s += "."
+    self.vals['undefined'] = s
+
+  def toPcap(self):
+    return self.data
+
+# Every Leftovers made as [dpkt object, frame, offset]
+made = []
+newInit = layer.Leftovers.__init__
+
+def recInit(self, data, frame=None, off=0):
+  made.append([data, frame, off])
+  newInit(self, data, frame, off)
+
+# Returns best time in seconds of runs builds of every Leftovers in calls with f
+def timeBuilds(f, calls, runs):
+  best = None
+  for ii in xrange(runs):
+    start = time.time()
+    for args in calls:
+      f(*args)
+    elapsed = time.time() - start
+    if(best is None or elapsed < best):
+      best = elapsed
+  return best
+
+# Returns passed Leftovers args with the dpkt object decoded again from its frame padded out to a jumbo frame
+def pad(data, frame, off):
+  frame = frame + "\x00" * (jumbo - len(frame))
+  return [data.__class__(frame[off:]), frame, off]
+
+if(len(sys.argv) > 1):
+  runs = int(sys.argv[1])
+else:
+  runs = 5
+if(len(sys.argv) > 2):
+  fNames = sys.argv[2:]
+else:
+  fNames = sorted(glob.glob(utilDir + '/../traces/*.pcap'))
+
+layer.Leftovers.__init__ = recInit
+for fName in fNames:
+  f = open(fName, 'rb')
+  try:
+    capture.Capture(f, fName)
+  except Exception, e:
+    print "Skipping " + os.path.basename(fName) + ": " + str(e)
+  finally:
+    f.close()
+layer.Leftovers.__init__ = newInit
+
+calls = [args for args in made if(args[1] is not None)]
+jumbos = [pad(*args) for args in calls]
+
+bad = 0
+for args in calls + jumbos:
+  old = OldLeftovers(args[0])
+  new = layer.Leftovers(*args)
+  if(old.vals != new.vals):
+    bad += 1
+print "Traces:" + str(len(fNames)) + " leftovers:" + str(len(calls)) + " runs:" + str(runs) + " mismatches:" + str(bad)
+
+for title, args in (('traces', calls), ('jumbo', jumbos)):
+  o = timeBuilds(lambda data, frame, off: OldLeftovers(data), args, runs)
+  n = timeBuilds(layer.Leftovers, args, runs)
+  print "  " + title.ljust(8) + " old " + "{:.4f}".format(o) + "s  new " + "{:.4f}".format(n) + "s  speedup " + "{:.1f}".format(o / n) + "x"
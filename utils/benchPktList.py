@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+'''
+Copyright (c) 2014, Andrew McConachie <smutt@depht.com>
+All rights reserved.
+'''
+
+# Times yank and paste on our chunked PacketList against the old flat list
+# Uses a synthetic capture of PACKETS records that decode to tiny stand-in packets
+# Decoding is not what we're timing
+# USAGE: benchPktList.py [ PACKETS ] [ RUNS ]
+
+import sys
+import time
+import random
+utilDir = sys.path[0]
+sys.path.insert(0, utilDir + '/../hexcap/')
+import pktlist
+
+# Stands in for a decoded packet
+class SynthPkt(object):
+  __slots__ = ('rec', 'dirty')
+
+  def __init__(self, rec):
+    self.rec = rec
+    self.dirty = False
+
+# PacketList as it was before it kept members in chunks, only what we time
+class FlatList:
+  def __init__(self, decode):
+    self._items = []
+    self.decode = decode
+
+  def __len__(self):
+    return len(self._items)
+
+  def extend(self, items):
+    self._items.extend(items)
+
+  def record(self, ii):
+    item = self._items[ii]
+    if(isinstance(item, int)):
+      return item
+    return None
+
+  def pop(self, ii):
+    item = self._items.pop(ii)
+    if(isinstance(item, int)):
+      return self.decode(item)
+    return item
+
+  def insert(self, ii, pkt):
+    self._items.insert(ii, pkt)
+
+# Capture.yank() and Capture.paste() as they were with a flat list
+def flatYank(pl, first, last):
+  return [pl.pop(first) for ii in xrange(first, last + 1)]
+
+def flatPaste(pl, first, pkts):
+  for ii in xrange(len(pkts)):
+    pl.insert(first + ii, pkts[ii])
+
+def chunkYank(pl, first, last):
+  return pl.popRange(first, last)
+
+def chunkPaste(pl, first, pkts):
+  pl.insertRange(first, pkts)
+
+# Yanks count packets at first and pastes them straight back, runs times
+# Returns best time in seconds for one yank and paste
+def yankPaste(pl, yank, paste, first, count, runs):
+  best = None
+  for ii in xrange(runs):
+    start = time.time()
+    pkts = yank(pl, first, first + count - 1)
+    paste(pl, first, pkts)
+    elapsed = time.time() - start
+    if(best is None or elapsed < best):
+      best = elapsed
+  return best
+
+# Returns seconds taken to look up passed indexes
+def lookups(pl, idxs):
+  start = time.time()
+  for ii in idxs:
+    pl.record(ii)
+  return time.time() - start
+
+if(len(sys.argv) > 1):
+  numPkts = int(sys.argv[1])
+else:
+  numPkts = 5000000
+if(len(sys.argv) > 2):
+  runs = int(sys.argv[2])
+else:
+  runs = 3
+
+start = time.time()
+flat = FlatList(SynthPkt)
+flat.extend(xrange(numPkts))
+flatBuild = time.time() - start
+start = time.time()
+chunked = pktlist.PacketList(SynthPkt)
+chunked.extend(xrange(numPkts))
+chunkBuild = time.time() - start
+
+print "Packets:" + str(numPkts) + " chunkSize:" + str(chunked.chunkSize) + " runs:" + str(runs)
+print "build:  flat " + "{:.3f}".format(flatBuild) + "s  chunked " + "{:.3f}".format(chunkBuild) + "s"
+
+random.seed(0)
+idxs = [random.randrange(numPkts) for ii in xrange(1000000)]
+print "1M random lookups:  flat " + "{:.3f}".format(lookups(flat, idxs)) + "s  chunked " + "{:.3f}".format(lookups(chunked, idxs)) + "s"
+
+print "yank and paste back:"
+for count in (1, 100, 10000):
+  for where, first in (('head', 0), ('middle', numPkts // 2), ('tail', numPkts - count)):
+    f = yankPaste(flat, flatYank, flatPaste, first, count, runs)
+    c = yankPaste(chunked, chunkYank, chunkPaste, first, count, runs)
+    print "  " + str(count).rjust(5) + " at " + where.ljust(6) + "  flat " + "{:.5f}".format(f) + "s  chunked " + "{:.5f}".format(c) + "s  speedup " + "{:.1f}".format(f / c) + "x"